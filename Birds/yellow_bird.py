@@ -1,57 +1,10 @@
-import pymunk
-from game_logic import ImpulseVector, Point2D, get_impulse_vector
 from game_object import Bird
+from simulation import SimYellowBird
 
 
 class YellowBird(Bird):
-    def __init__(
-        self,
-        image_path: str,
-        scale: float,
-        impulse_vector: ImpulseVector,
-        x: float,
-        y: float,
-        space: pymunk.Space,
-        mass: float = 5,
-        radius: float = 12,
-        max_impulse: float = 100,
-        power_multiplier: float = 50,
-        elasticity: float = 0.8,
-        friction: float = 1,
-        collision_layer: int = 0,
-        boost_multiplier: float = 3.0,
-    ):
-        super().__init__(
-            image_path,
-            scale,
-            impulse_vector,
-            x,
-            y,
-            space,
-            mass,
-            radius,
-            max_impulse,
-            power_multiplier,
-            elasticity,
-            friction,
-            collision_layer,
-        )
-        self.boost_multiplier = boost_multiplier
-        self.is_boosted = False
+    """Yellow bird sprite. The boost on power up is done by SimYellowBird"""
 
-    def update(self, delta_time: float = 1/60):
-        super().update(delta_time)
-        if self.is_boosted:
-            # Obtener el vector de velocidad actual
-            velocity = self.body.velocity
-            # Calcular el ángulo del vector de velocidad
-            angle = velocity.angle
-            # Aplicar un impulso en la misma dirección que la velocidad
-            impulse = 300.0 * self.boost_multiplier  # Aumentamos el impulso base
-            self.body.apply_impulse_at_local_point(
-                impulse * velocity.normalized()
-            )
-
-    def power_up(self):
-        self.is_boosted = True
-        self.update()
+    kind = SimYellowBird.kind
+    image_path = "assets/img/yellowBird.png"
+    sprite_scale = 0.05
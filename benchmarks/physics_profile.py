@@ -0,0 +1,41 @@
+"""
+Step time of the shipped levels and of large generated ones, with pymunk's
+default space settings and with the derived physics profile.
+
+    python -m benchmarks.physics_profile
+"""
+import argparse
+import time
+
+from level_generator import generate_level
+from levels import LevelData, PhysicsProfile, levels
+from simulation import Simulation, derive_physics_profile
+
+
+def time_steps(level_data: LevelData, profile: PhysicsProfile, steps: int) -> float:
+    """Mean milliseconds per step over ``steps`` steps after loading the level"""
+    sim = Simulation()
+    sim.load_level(level_data, profile)
+    start = time.perf_counter()
+    sim.step(steps)
+    return (time.perf_counter() - start) * 1000 / steps
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--steps", type=int, default=300)
+    args = parser.parse_args()
+
+    cases = [(f"level {i + 1}", level_data) for i, level_data in enumerate(levels)]
+    cases += [(f"{n} columns", generate_level("stacks", n, n // 10)) for n in (100, 1000, 5000)]
+
+    print(f"{'level':>14} {'objects':>8} {'default ms':>11} {'profile ms':>11} {'speedup':>8}")
+    for name, level_data in cases:
+        n_objects = len(level_data.columns) + len(level_data.pigs)
+        default = time_steps(level_data, PhysicsProfile(), args.steps)
+        tuned = time_steps(level_data, derive_physics_profile(level_data), args.steps)
+        print(f"{name:>14} {n_objects:>8} {default:>11.3f} {tuned:>11.3f} {default / tuned:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+"""
+Physics and frame time benchmark suite. Every shipped level and generated
+levels of 10 to 5000 objects get a scripted shot with each bird type; the
+report has physics step time percentiles, collision callbacks, sprite sync
+cost and the memory high-water mark of each case, and can be written as
+JSON to compare runs across commits.
+
+    python -m benchmarks.suite --output before.json
+    python -m benchmarks.suite --output after.json --compare before.json
+
+Sprite sync needs arcade; without a display set ARCADE_HEADLESS=1, or pass
+--no-sprites to measure physics only.
+"""
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+from game_logic import Point2D, get_impulse_vector
+from level_generator import generate_level
+from levels import LevelData, levels
+from simulation import BIRD_TYPES, SLINGSHOT_X, SLINGSHOT_Y, Simulation
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+SIZES = (10, 100, 1000, 5000)
+
+# Pull point and power up step of the scripted shot for each bird type
+SHOTS = {
+    "red": ((200, 40), None),
+    "blue": ((200, 40), 20),
+    "yellow": ((200, 40), 10),
+}
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    samples = sorted(samples)
+    n = len(samples)
+    return {
+        "mean": sum(samples) / n,
+        "p50": samples[n // 2],
+        "p90": samples[min(n - 1, int(n * 0.9))],
+        "p99": samples[min(n - 1, int(n * 0.99))],
+        "max": samples[-1],
+    }
+
+
+def max_rss_kb() -> Optional[int]:
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return rss // 1024 if sys.platform == "darwin" else rss
+
+
+def attach_sprites(sim: Simulation):
+    """
+    Mirror the simulation in an arcade SpriteList, the way App does. Returns
+    None when arcade cannot be imported (no display).
+    """
+    try:
+        import arcade
+        from Birds.blue_bird import BlueBird
+        from Birds.yellow_bird import YellowBird
+        from game_object import Bird, Column, Pig
+    except Exception:
+        return None
+
+    sprite_classes = {cls.kind: cls for cls in (Bird, BlueBird, YellowBird, Pig, Column)}
+    sprites = arcade.SpriteList(lazy=True)
+
+    def add_sprite(model):
+        if model.view is None:
+            model.view = sprite_classes[model.kind](model)
+        sprites.append(model.view)
+
+    sim.on_spawn = add_sprite
+    sim.on_remove = lambda model: model.view.remove_from_sprite_lists()
+    return sprites
+
+
+def run_case(name: str, level_data: LevelData, bird_type: str, steps: int, with_sprites: bool) -> dict:
+    """Load a level, fire the scripted shot and time ``steps`` physics steps"""
+    sim = Simulation()
+    sprites = attach_sprites(sim) if with_sprites else None
+    if sprites is not None:
+        from game_object import sync_sprites
+    sim.load_level(level_data)
+
+    (pull_x, pull_y), power_up_step = SHOTS[bird_type]
+    impulse_vector = get_impulse_vector(Point2D(SLINGSHOT_X, SLINGSHOT_Y), Point2D(pull_x, pull_y))
+    bird = sim.launch(bird_type, impulse_vector, pull_x, pull_y)
+
+    step_ms = []
+    sync_ms = []
+    for i in range(steps):
+        if i == power_up_step:
+            sim.power_up(bird)
+        start = time.perf_counter()
+        sim.step()
+        step_ms.append((time.perf_counter() - start) * 1000)
+        if sprites is not None:
+            start = time.perf_counter()
+            sync_sprites(sprites)
+            sync_ms.append((time.perf_counter() - start) * 1000)
+
+    simulated_seconds = steps * sim.dt
+    return {
+        "level": name,
+        "objects": len(level_data.columns) + len(level_data.pigs),
+        "bird": bird_type,
+        "steps": steps,
+        "step_ms": percentiles(step_ms),
+        "collision_callbacks": sim.collision_callbacks,
+        "collision_callbacks_per_second": sim.collision_callbacks / simulated_seconds,
+        "sprite_sync_ms": percentiles(sync_ms) if sync_ms else None,
+        "pigs_destroyed": sim.destroyed["pig"],
+        "birds_culled": dict(sim.culled),
+        "max_rss_kb": max_rss_kb(),
+    }
+
+
+def _run_case(args) -> dict:
+    return run_case(*args)
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: List[dict], baseline_path: str):
+    with open(baseline_path) as f:
+        baseline = {(case["level"], case["bird"]): case for case in json.load(f)["cases"]}
+    print(f"\n{'level':>12} {'bird':>7} {'p50 before':>11} {'p50 after':>10} {'change':>8}")
+    for case in results:
+        before = baseline.get((case["level"], case["bird"]))
+        if before is None:
+            continue
+        old = before["step_ms"]["p50"]
+        new = case["step_ms"]["p50"]
+        print(f"{case['level']:>12} {case['bird']:>7} {old:>11.3f} {new:>10.3f} {(new - old) / old:>+7.0%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Physics and frame time benchmarks")
+    parser.add_argument("--steps", type=int, default=300)
+    parser.add_argument("--sizes", type=int, nargs="*", default=SIZES, help="generated level sizes")
+    parser.add_argument("--no-sprites", action="store_true", help="skip the sprite sync measurement")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="JSON file of an earlier run to compare against")
+    args = parser.parse_args()
+
+    cases = [(f"level {i + 1}", level_data) for i, level_data in enumerate(levels)]
+    # Generated levels: n objects, one pig for every ten columns
+    cases += [(f"{n} objects", generate_level("fortress", n - n // 11, n // 11)) for n in args.sizes]
+    jobs = [
+        (name, level_data, bird_type, args.steps, not args.no_sprites)
+        for name, level_data in cases
+        for bird_type in BIRD_TYPES
+    ]
+
+    # One fresh process per case so the memory high-water mark is its own
+    results = []
+    print(f"{'level':>12} {'bird':>7} {'p50 ms':>8} {'p99 ms':>8} {'sync ms':>8} {'cb/s':>9} {'rss MB':>7}")
+    with ProcessPoolExecutor(max_workers=1, max_tasks_per_child=1) as executor:
+        for case in executor.map(_run_case, jobs):
+            results.append(case)
+            sync = case["sprite_sync_ms"]
+            rss = case["max_rss_kb"]
+            print(
+                f"{case['level']:>12} {case['bird']:>7} "
+                f"{case['step_ms']['p50']:>8.3f} {case['step_ms']['p99']:>8.3f} "
+                f"{sync['p50'] if sync else float('nan'):>8.3f} "
+                f"{case['collision_callbacks_per_second']:>9.0f} "
+                f"{rss / 1024 if rss else float('nan'):>7.1f}"
+            )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(
+                {
+                    "commit": git_commit(),
+                    "python": platform.python_version(),
+                    "platform": platform.platform(),
+                    "cases": results,
+                },
+                f,
+                indent=2,
+            )
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+"""
+Gym-style environments over the headless simulation, for bulk level
+evaluation and agent training. An episode is one level: ``reset`` puts a
+settled level in place and every ``step`` is one shot, run until the level
+is at rest again. VectorShotEnv runs many of them in worker processes and
+batches their observations into NumPy arrays.
+
+    env = ShotEnv()
+    observation, info = env.reset(level=2)
+    observation, reward, terminated, truncated, info = env.step((200, 40, BIRD_KINDS.index("blue"), 20))
+
+    python env.py --envs 16 --shots 5000
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from levels import LevelData, levels
+from simulation import BIRD_TYPES, MAX_PULL_DISTANCE, SLINGSHOT_X, SLINGSHOT_Y, Simulation, SimBird, Snapshot
+from solver import clamp_pull, fire_shot
+
+# Bird type of each action index
+BIRD_KINDS = tuple(BIRD_TYPES)
+
+# Observation rows: one per pig or column, in spawn order, zero padded
+MAX_OBJECTS = 256
+OBSERVATION_FIELDS = ("kind", "x", "y", "angle")
+OBJECT_KINDS = {"pig": 1, "column": 2}
+
+# Shots per episode and steps a shot may take before it is cut short
+MAX_SHOTS = 3
+MAX_SHOT_STEPS = 60 * 20
+SETTLE_STEPS = 60
+
+
+class ShotEnv:
+    """
+    One level at a time. Actions are ``(pull_x, pull_y, bird, power_up_step)``:
+    a pull point (clamped to the slingshot's reach like the mouse), an index
+    into BIRD_KINDS and the step after launch at which to power up, negative
+    for never; the last item may be left out. The reward is the number of
+    pigs killed by the shot, and the episode ends when no pig is left or
+    after ``max_shots`` shots.
+
+    Observations are float32 arrays of shape ``(max_objects, 4)`` holding
+    the kind (OBJECT_KINDS), position and angle of every live pig and column.
+    """
+
+    def __init__(
+        self,
+        level_list: Optional[Sequence[LevelData]] = None,
+        max_objects: int = MAX_OBJECTS,
+        max_shots: int = MAX_SHOTS,
+        max_shot_steps: int = MAX_SHOT_STEPS,
+        settle_steps: int = SETTLE_STEPS,
+    ):
+        self.levels = levels if level_list is None else level_list
+        self.max_objects = max_objects
+        self.max_shots = max_shots
+        self.max_shot_steps = max_shot_steps
+        self.settle_steps = settle_steps
+        self.rng = random.Random()
+        # Settled simulation and its snapshot per level index, so a reset
+        # is a restore instead of building and settling the level again
+        self.settled: Dict[int, Tuple[Simulation, Snapshot]] = {}
+        self.simulation: Optional[Simulation] = None
+        self.level = 0
+        self.shots = 0
+
+    def reset(self, seed: Optional[int] = None, level: Optional[int] = None) -> Tuple[np.ndarray, dict]:
+        """Start an episode on ``level``, a random level if not given"""
+        if seed is not None:
+            self.rng.seed(seed)
+        self.level = self.rng.randrange(len(self.levels)) if level is None else level
+        if self.level not in self.settled:
+            sim = Simulation()
+            sim.load_level(self.levels[self.level])
+            sim.step(self.settle_steps)
+            self.settled[self.level] = (sim, sim.snapshot())
+        self.simulation, snapshot = self.settled[self.level]
+        self.simulation.restore(snapshot)
+        self.shots = 0
+        return self.observe(), self.info()
+
+    def step(self, action: Sequence[float]) -> Tuple[np.ndarray, float, bool, bool, dict]:
+        pull_x, pull_y, bird = action[:3]
+        power_up_step = int(action[3]) if len(action) > 3 else -1
+        pull_x, pull_y = clamp_pull(float(pull_x), float(pull_y))
+        pigs, objects = fire_shot(
+            self.simulation,
+            BIRD_KINDS[int(bird)],
+            pull_x,
+            pull_y,
+            power_up_step if power_up_step >= 0 else None,
+            self.max_shot_steps,
+        )
+        self.shots += 1
+        terminated = self.simulation.is_level_complete()
+        truncated = not terminated and self.shots >= self.max_shots
+        info = self.info()
+        info["objects_destroyed"] = objects
+        return self.observe(), float(pigs), terminated, truncated, info
+
+    def observe(self) -> np.ndarray:
+        observation = np.zeros((self.max_objects, len(OBSERVATION_FIELDS)), dtype=np.float32)
+        objects = sorted(
+            (obj for obj in self.simulation.objects_by_shape.values() if not isinstance(obj, SimBird)),
+            key=lambda obj: obj.id,
+        )[: self.max_objects]
+        if objects:
+            observation[: len(objects)] = [
+                (OBJECT_KINDS[obj.kind], *obj.body.position, obj.body.angle) for obj in objects
+            ]
+        return observation
+
+    def info(self) -> dict:
+        sim = self.simulation
+        return {
+            "level": self.level,
+            "shots": self.shots,
+            "pigs_remaining": sim.pigs_remaining(),
+            "score": sim.score,
+        }
+
+    def sample_action(self) -> Tuple[float, float, int, int]:
+        """Random pull point and bird, never powered up"""
+        x = self.rng.uniform(SLINGSHOT_X - MAX_PULL_DISTANCE, SLINGSHOT_X + MAX_PULL_DISTANCE)
+        y = self.rng.uniform(SLINGSHOT_Y - MAX_PULL_DISTANCE, SLINGSHOT_Y + MAX_PULL_DISTANCE)
+        return x, y, self.rng.randrange(len(BIRD_KINDS)), -1
+
+
+def _worker(conn, n_envs: int, level_list: List[LevelData], env_kwargs: dict):
+    """Worker process loop: serves reset and step commands for its share of environments"""
+    envs = [ShotEnv(level_list, **env_kwargs) for _ in range(n_envs)]
+    try:
+        while True:
+            command, args = conn.recv()
+            if command == "reset":
+                seeds, level_indices = args
+                results = [env.reset(seed, level) for env, seed, level in zip(envs, seeds, level_indices)]
+                conn.send(results)
+            elif command == "step":
+                results = []
+                for env, action in zip(envs, args):
+                    observation, reward, terminated, truncated, info = env.step(action)
+                    if terminated or truncated:
+                        # Autoreset, the last observation of the episode goes in the info
+                        info["final_observation"] = observation
+                        observation, _ = env.reset()
+                    results.append((observation, reward, terminated, truncated, info))
+                conn.send(results)
+            elif command == "close":
+                break
+    finally:
+        conn.close()
+
+
+class VectorShotEnv:
+    """
+    ``n_envs`` ShotEnvs split over ``workers`` processes, stepped together.
+    Observations come back stacked as ``(n_envs, max_objects, 4)`` and
+    rewards and done flags as ``(n_envs,)`` arrays. Finished environments
+    reset themselves; the last observation of their episode is in the
+    info under "final_observation".
+    """
+
+    def __init__(
+        self,
+        n_envs: int,
+        workers: Optional[int] = None,
+        level_list: Optional[Sequence[LevelData]] = None,
+        **env_kwargs,
+    ):
+        self.n_envs = n_envs
+        workers = max(1, min(n_envs, workers or os.cpu_count() or 1))
+        # Workers get the levels themselves, a lazy LevelSet is not picklable
+        level_list = list(levels if level_list is None else level_list)
+        sizes = [n_envs // workers + (i < n_envs % workers) for i in range(workers)]
+        self.splits = np.cumsum([0] + sizes)
+        self.connections = []
+        self.processes = []
+        for size in sizes:
+            parent, child = multiprocessing.Pipe()
+            process = multiprocessing.Process(
+                target=_worker, args=(child, size, level_list, env_kwargs), daemon=True
+            )
+            process.start()
+            child.close()
+            self.connections.append(parent)
+            self.processes.append(process)
+
+    def _scatter(self, items: Sequence) -> List[Sequence]:
+        return [items[start:end] for start, end in zip(self.splits[:-1], self.splits[1:])]
+
+    def _gather(self) -> list:
+        return [result for conn in self.connections for result in conn.recv()]
+
+    def reset(
+        self, seed: Optional[int] = None, levels: Optional[Sequence[int]] = None
+    ) -> Tuple[np.ndarray, List[dict]]:
+        """Reset every environment, to ``levels[i]`` if given. Environment i is seeded with ``seed + i``"""
+        seeds = [None if seed is None else seed + i for i in range(self.n_envs)]
+        level_indices = list(levels) if levels is not None else [None] * self.n_envs
+        for conn, env_seeds, env_levels in zip(self.connections, self._scatter(seeds), self._scatter(level_indices)):
+            conn.send(("reset", (env_seeds, env_levels)))
+        observations, infos = zip(*self._gather())
+        return np.stack(observations), list(infos)
+
+    def step(self, actions) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, List[dict]]:
+        """Fire one shot in every environment. ``actions`` is ``(n_envs, 3)`` or ``(n_envs, 4)``"""
+        actions = np.asarray(actions, dtype=float)
+        for conn, env_actions in zip(self.connections, self._scatter(actions)):
+            conn.send(("step", env_actions))
+        observations, rewards, terminated, truncated, infos = zip(*self._gather())
+        return (
+            np.stack(observations),
+            np.array(rewards, dtype=np.float32),
+            np.array(terminated),
+            np.array(truncated),
+            list(infos),
+        )
+
+    def close(self):
+        for conn in self.connections:
+            conn.send(("close", None))
+            conn.close()
+        for process in self.processes:
+            process.join()
+        self.connections = []
+        self.processes = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fire random shots in parallel environments and report the throughput")
+    parser.add_argument("--envs", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--shots", type=int, default=1000, help="shots in total, over all environments")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    with VectorShotEnv(args.envs, args.workers) as env:
+        env.reset(seed=args.seed)
+        rounds = max(1, args.shots // args.envs)
+        pigs = 0.0
+        start = time.perf_counter()
+        for _ in range(rounds):
+            pull = rng.uniform(-MAX_PULL_DISTANCE, MAX_PULL_DISTANCE, (args.envs, 2)) + (SLINGSHOT_X, SLINGSHOT_Y)
+            birds = rng.integers(len(BIRD_KINDS), size=(args.envs, 1))
+            _, rewards, _, _, _ = env.step(np.hstack([pull, birds]))
+            pigs += rewards.sum()
+        seconds = time.perf_counter() - start
+    shots = rounds * args.envs
+    print(f"{shots} shots in {seconds:.1f} s ({shots / seconds * 60:.0f} shots/min), {pigs:.0f} pigs killed")
+
+
+if __name__ == "__main__":
+    main()
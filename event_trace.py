@@ -0,0 +1,154 @@
+"""
+Binary event trace. A fixed-size ring buffer of 32 byte records (collisions,
+destroyed objects, launches, pulls and level changes) allocated once, so
+recording an event is a single struct.pack_into call. The game dumps it on
+demand (F4) and when it crashes; this module also decodes dumps:
+
+    python event_trace.py trace.bin --event collision --last 50
+"""
+import argparse
+import struct
+from typing import Iterator, List, NamedTuple
+
+# Records kept, the oldest ones are overwritten
+TRACE_CAPACITY = 1 << 16
+
+# step, event, kind, a, b, x, y, value, angle
+RECORD = struct.Struct("<IBBxxiiffff")
+HEADER = struct.Struct("<4sHHQ")
+MAGIC = b"ABTR"
+FORMAT_VERSION = 1
+
+# Event codes. a and b hold object ids (0 is the floor), what the floats mean
+# depends on the event
+EVENT_COLLISION = 1  # a, b collided, value: impulse
+EVENT_DESTROY = 2  # a of kind was destroyed
+EVENT_LAUNCH = 3  # a of kind launched from x, y, value: impulse, angle
+EVENT_POWER_UP = 4  # a of kind powered up
+EVENT_LEVEL = 5  # level loaded, a columns and b pigs
+EVENT_RESTORE = 6  # level restored from a snapshot
+EVENT_PULL = 7  # slingshot grabbed at x, y
+EVENT_DRAG = 8  # slingshot pulled to x, y
+EVENT_RELEASE = 9  # slingshot released at x, y
+
+EVENT_NAMES = {
+    EVENT_COLLISION: "collision",
+    EVENT_DESTROY: "destroy",
+    EVENT_LAUNCH: "launch",
+    EVENT_POWER_UP: "power_up",
+    EVENT_LEVEL: "level",
+    EVENT_RESTORE: "restore",
+    EVENT_PULL: "pull",
+    EVENT_DRAG: "drag",
+    EVENT_RELEASE: "release",
+}
+
+# Object kinds, stored as one byte
+KINDS = ("", "pig", "column", "red", "blue", "yellow")
+KIND_CODES = {kind: code for code, kind in enumerate(KINDS)}
+
+
+class Event(NamedTuple):
+    step: int
+    event: int
+    kind: int
+    a: int
+    b: int
+    x: float
+    y: float
+    value: float
+    angle: float
+
+    def __str__(self) -> str:
+        name = EVENT_NAMES.get(self.event, f"event {self.event}")
+        kind = KINDS[self.kind] if self.kind < len(KINDS) else self.kind
+        if self.event == EVENT_COLLISION:
+            details = f"{self.a} {self.b} impulse {self.value:.1f}"
+        elif self.event in (EVENT_DESTROY, EVENT_POWER_UP):
+            details = f"{kind} {self.a}"
+        elif self.event == EVENT_LAUNCH:
+            details = f"{kind} {self.a} from ({self.x:.1f}, {self.y:.1f}) impulse {self.value:.1f} angle {self.angle:.3f}"
+        elif self.event == EVENT_LEVEL:
+            details = f"{self.a} columns, {self.b} pigs"
+        elif self.event in (EVENT_PULL, EVENT_DRAG, EVENT_RELEASE):
+            details = f"({self.x:.1f}, {self.y:.1f})"
+        else:
+            details = ""
+        return f"{self.step:>8} {name:<10} {details}"
+
+
+class EventTrace:
+    """Ring buffer of the last ``capacity`` events"""
+
+    def __init__(self, capacity: int = TRACE_CAPACITY):
+        self.capacity = capacity
+        self.buffer = bytearray(capacity * RECORD.size)
+        # Events recorded so far, including the overwritten ones
+        self.count = 0
+
+    def record(
+        self,
+        step: int,
+        event: int,
+        kind: int = 0,
+        a: int = 0,
+        b: int = 0,
+        x: float = 0.0,
+        y: float = 0.0,
+        value: float = 0.0,
+        angle: float = 0.0,
+    ):
+        RECORD.pack_into(self.buffer, self.count % self.capacity * RECORD.size, step, event, kind, a, b, x, y, value, angle)
+        self.count += 1
+
+    def collision(self, step: int, a: int, b: int, impulse: float):
+        # The most frequent event, packed without going through keyword arguments
+        RECORD.pack_into(
+            self.buffer, self.count % self.capacity * RECORD.size, step, EVENT_COLLISION, 0, a, b, 0.0, 0.0, impulse, 0.0
+        )
+        self.count += 1
+
+    def ordered(self) -> bytes:
+        """Stored records, oldest first"""
+        if self.count <= self.capacity:
+            return bytes(self.buffer[: self.count * RECORD.size])
+        start = self.count % self.capacity * RECORD.size
+        return bytes(self.buffer[start:] + self.buffer[:start])
+
+    def events(self) -> Iterator[Event]:
+        for fields in RECORD.iter_unpack(self.ordered()):
+            yield Event(*fields)
+
+    def dump(self, path: str):
+        """Write the stored events to a file that ``load`` reads back"""
+        with open(path, "wb") as f:
+            f.write(HEADER.pack(MAGIC, FORMAT_VERSION, RECORD.size, self.count))
+            f.write(self.ordered())
+
+
+def load(path: str) -> List[Event]:
+    with open(path, "rb") as f:
+        magic, version, record_size, _ = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC or version != FORMAT_VERSION or record_size != RECORD.size:
+            raise ValueError(f"{path}: not an event trace of version {FORMAT_VERSION}")
+        return [Event(*fields) for fields in RECORD.iter_unpack(f.read())]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Decode an event trace dump")
+    parser.add_argument("path")
+    parser.add_argument("--event", choices=sorted(EVENT_NAMES.values()), action="append", help="only these events, repeatable")
+    parser.add_argument("--last", type=int, help="only the last N events")
+    args = parser.parse_args()
+
+    events = load(args.path)
+    if args.event:
+        events = [event for event in events if EVENT_NAMES.get(event.event) in args.event]
+    if args.last:
+        events = events[-args.last :]
+    for event in events:
+        print(event)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+"""
+Seeded procedural level generator for scale testing. Levels are built from
+vertical column stacks standing on the floor, low enough not to break under
+their own weight, with pigs on the floor between them. Generated levels
+never start with overlapping objects.
+
+    python level_generator.py fortress --columns 2000 --pigs 200 --seed 7
+    python main.py --generate fortress --columns 2000 --pigs 200 --seed 7
+    python level_generator.py field --columns 5000 --output field.npz
+    python main.py --levels field.npz
+"""
+import argparse
+import random
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+from levels import LevelData, write_level
+from simulation import (
+    COLUMN_HEIGHT,
+    COLUMN_MASS,
+    COLUMN_WIDTH,
+    DAMAGE_THRESHOLD,
+    FLOOR_Y,
+    GRAVITY,
+    PHYSICS_DT,
+    PIG_RADIUS,
+    Simulation,
+)
+
+# Clearance between neighbouring objects, in pixels
+CLEARANCE = 4
+PIG_GAP = 2 * PIG_RADIUS + 2 * CLEARANCE
+
+# Objects resting on something sink this far into it. Shapes that merely
+# touch may or may not collide depending on rounding, which far from the
+# origin is enough for a stack to fall onto itself on the first step; an
+# overlap below pymunk's collision slop (0.1) is a resting contact that is
+# never pushed apart.
+SEAT_DEPTH = 0.05
+
+# Fraction of the damage threshold a resting contact may carry. The solver
+# overshoots the static load by more than half while a stack settles.
+LOAD_MARGIN = 0.6
+
+# How each kind of level lays out its stacks: stack heights, gap between
+# stacks without a pig and the chance of leaving a pig gap instead
+Layout = Tuple[Tuple[int, int], Tuple[float, float], float]
+
+LAYOUTS: Dict[str, Layout] = {
+    # Gruesas murallas bajas con cerdos en cada celda
+    "fortress": ((2, 3), (0, 0), 0.5),
+    # Torres lo más altas posible, separadas
+    "stacks": ((3, 3), (30, 60), 0.2),
+    # Campo ancho de pilas bajas
+    "field": ((1, 2), (20, 120), 0.3),
+}
+
+
+def max_stack_height() -> int:
+    """
+    Tallest column stack that does not break under its own weight. Damage is
+    impulse based and a resting contact takes the weight of everything above
+    it every step, so the bottom joint of a tall stack breaks by itself.
+    """
+    load = DAMAGE_THRESHOLD * LOAD_MARGIN
+    return int(load // (COLUMN_MASS * -GRAVITY * PHYSICS_DT)) + 1
+
+
+def _build(rng: random.Random, layout: Layout, n_columns: int, n_pigs: int, start_x: float) -> LevelData:
+    (min_height, max_height), (min_gap, max_gap), pig_gap_chance = layout
+    columns: List[Tuple[float, float]] = []
+    pigs: List[Tuple[float, float]] = []
+
+    max_height = min(max_height, max_stack_height())
+    min_height = min(min_height, max_height)
+
+    x = start_x
+    while len(columns) < n_columns:
+        height = min(rng.randint(min_height, max_height), n_columns - len(columns))
+        for layer in range(height):
+            columns.append((x, FLOOR_Y + COLUMN_HEIGHT / 2 - SEAT_DEPTH + layer * (COLUMN_HEIGHT - SEAT_DEPTH)))
+
+        if len(pigs) < n_pigs and rng.random() < pig_gap_chance:
+            # Cerdo en el suelo entre dos pilas
+            x += COLUMN_WIDTH / 2 + PIG_GAP / 2
+            pigs.append((x, FLOOR_Y + PIG_RADIUS - SEAT_DEPTH))
+            x += PIG_GAP / 2 + COLUMN_WIDTH / 2
+        else:
+            x += COLUMN_WIDTH + CLEARANCE + rng.uniform(min_gap, max_gap)
+
+    # Pigs resting on top of a stack roll off, the ones left go on the floor after the last stack
+    x += PIG_GAP / 2
+    while len(pigs) < n_pigs:
+        pigs.append((x, FLOOR_Y + PIG_RADIUS - SEAT_DEPTH))
+        x += PIG_GAP
+
+    return LevelData(columns=columns, pigs=pigs)
+
+
+def generate_level(kind: str, n_columns: int, n_pigs: int, seed: int = 0, start_x: float = 600) -> LevelData:
+    """
+    Generate a level of the given kind ("fortress", "stacks" or "field") with
+    exactly ``n_columns`` columns and ``n_pigs`` pigs, starting at
+    ``start_x``. The same arguments always give the same level.
+    """
+    level_data = _build(random.Random(seed), LAYOUTS[kind], n_columns, n_pigs, start_x)
+    overlaps = find_overlaps(level_data)
+    if overlaps:
+        raise ValueError(f"Generated level has {len(overlaps)} overlapping objects")
+    return level_data
+
+
+def _bounds(level_data: LevelData) -> List[Tuple[str, float, float, float, float]]:
+    """Kind and bounding box of every object, as (kind, left, bottom, right, top)"""
+    boxes = []
+    for column in level_data.columns:
+        x, y = column[0], column[1]
+        # Horizontal columns have the same physical box, only the sprite is rotated
+        boxes.append(("column", x - COLUMN_WIDTH / 2, y - COLUMN_HEIGHT / 2, x + COLUMN_WIDTH / 2, y + COLUMN_HEIGHT / 2))
+    for x, y in level_data.pigs:
+        boxes.append(("pig", x - PIG_RADIUS, y - PIG_RADIUS, x + PIG_RADIUS, y + PIG_RADIUS))
+    return boxes
+
+
+def _overlap(a, b, tolerance: float) -> bool:
+    kind_a, l1, b1, r1, t1 = a
+    kind_b, l2, b2, r2, t2 = b
+    if min(r1, r2) - max(l1, l2) <= tolerance or min(t1, t2) - max(b1, b2) <= tolerance:
+        return False
+    if kind_a == "column" and kind_b == "column":
+        return True
+    if kind_a == "pig" and kind_b == "pig":
+        ax, ay = (l1 + r1) / 2, (b1 + t1) / 2
+        bx, by = (l2 + r2) / 2, (b2 + t2) / 2
+        return (ax - bx) ** 2 + (ay - by) ** 2 < (2 * PIG_RADIUS - tolerance) ** 2
+    # Pig against column: distance from the pig centre to the box
+    pig, box = (a, b) if kind_a == "pig" else (b, a)
+    cx, cy = (pig[1] + pig[3]) / 2, (pig[2] + pig[4]) / 2
+    dx = max(box[1] - cx, 0, cx - box[3])
+    dy = max(box[2] - cy, 0, cy - box[4])
+    return dx * dx + dy * dy < (PIG_RADIUS - tolerance) ** 2
+
+
+def find_overlaps(level_data: LevelData, tolerance: float = 0.1) -> List[Tuple[int, int]]:
+    """
+    Index pairs (into columns followed by pigs) of objects that overlap, and
+    objects reaching below the floor, by more than ``tolerance``. Uses a
+    uniform grid, so it stays fast for thousands of objects.
+    """
+    boxes = _bounds(level_data)
+    cell = COLUMN_HEIGHT
+    grid = defaultdict(list)
+    overlaps = []
+    for i, box in enumerate(boxes):
+        if box[2] < FLOOR_Y - tolerance:
+            overlaps.append((i, i))
+        cells = [
+            (cx, cy)
+            for cx in range(int(box[1] // cell), int(box[3] // cell) + 1)
+            for cy in range(int(box[2] // cell), int(box[4] // cell) + 1)
+        ]
+        candidates = {j for key in cells for j in grid[key]}
+        overlaps.extend((j, i) for j in sorted(candidates) if _overlap(boxes[j], box, tolerance))
+        for key in cells:
+            grid[key].append(i)
+    return overlaps
+
+
+def check_stable(level_data: LevelData, steps: int = 180) -> int:
+    """Objects destroyed after letting the level rest for ``steps`` physics steps"""
+    sim = Simulation()
+    sim.load_level(level_data)
+    sim.step(steps)
+    return sum(sim.destroyed.values())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a large level and check it settles")
+    parser.add_argument("kind", choices=sorted(LAYOUTS))
+    parser.add_argument("--columns", type=int, default=1000)
+    parser.add_argument("--pigs", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="save the level to this .json or .npz file")
+    args = parser.parse_args()
+
+    level_data = generate_level(args.kind, args.columns, args.pigs, args.seed)
+    xs = [column[0] for column in level_data.columns]
+    print(
+        f"{args.kind}: {len(level_data.columns)} columns, {len(level_data.pigs)} pigs, "
+        f"x from {min(xs):.0f} to {max(xs):.0f}"
+    )
+    print(f"destroyed while settling: {check_stable(level_data)}")
+    if args.output:
+        write_level(level_data, args.output)
+
+
+if __name__ == "__main__":
+    main()
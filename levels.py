@@ -1,5 +1,23 @@
+"""
+Level data and the on-disk level formats. Levels are authored as JSON files
+in assets/levels; large generated levels are stored as compressed numpy
+arrays (.npz). ``levels`` parses a file only when its level is played and
+can parse the next one in the background.
+"""
+import dataclasses
+import json
+import os
+from collections.abc import Sequence
+from concurrent.futures import Future, ThreadPoolExecutor
 from dataclasses import dataclass
-from typing import List, Tuple
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+LEVEL_DIR = "assets/levels"
+LEVEL_EXTENSIONS = (".json", ".npz")
+BINARY_FORMAT_VERSION = 1
+
 
 def add_columns_around_pig(pig_x, pig_y):
     return [
@@ -8,86 +26,174 @@ def add_columns_around_pig(pig_x, pig_y):
         (pig_x + 5, pig_y + 50, True),
     ]
 
+@dataclass
+class PhysicsProfile:
+    """
+    Space parameters for a level. The defaults are pymunk's own: no sleeping
+    and a bounding box tree as spatial index. simulation.derive_physics_profile
+    builds one from the level contents when a level does not store its own.
+    """
+    iterations: int = 10
+    sleep_time_threshold: float = float("inf")
+    idle_speed_threshold: float = 0  # 0: pymunk derives it from the gravity
+    spatial_hash_dim: Optional[float] = None  # None: keep the bounding box tree
+    spatial_hash_count: int = 0
+
+
 @dataclass
 class LevelData:
     columns: List[Tuple[float, float, bool]]
     pigs: List[Tuple[float, float]]
+    physics: Optional[PhysicsProfile] = None
 
 COLUMN_HEIGHT = 89
 
-levels = [
-    # Nivel 1: Cerdo solitario protegido
-    LevelData(
-        columns=[
-            (900, 50),  # Base simple
-            (900, 130),  # Soporte vertical
-            (880, 130, True),  # Techo protector
-        ],
-        pigs=[(950, 50)],  # Cerdo alejado de la estructura
-    ),
-    # Nivel 2: Cerdos separados
-    LevelData(
-        columns=[
-            # Torre izquierda simple
-            (800, 50),
-            (800, 130),
-            (780, 130, True),
-            # Torre derecha simple
-            (1000, 50),
-            (1000, 130),
-            (1020, 130, True),
-        ],
-        pigs=[(850, 50), (1050, 50)],  # Cerdos a los lados de las torres
-    ),
-    # Nivel 3: Tres refugios
-    LevelData(
-        columns=[
-            # Refugio izquierdo
-            (800, 50),
-            (780, 130, True),
-            # Refugio central
-            (900, 50),
-            (900, 130, True),
-            # Refugio derecho
-            (1000, 50),
-            (1020, 130, True),
-        ],
-        pigs=[(840, 50), (940, 50), (1040, 50)],  # Cerdos al lado de cada refugio
-    ),
-    # Nivel 4: Plataformas elevadas
-    LevelData(
-        columns=[
-            # Plataforma izquierda
-            (800, 50),
-            (800, 140),
-            (780, 230, True),
-            # Plataforma central
-            (900, 50),
-            (900, 140),
-            (900, 230, True),
-            # Plataforma derecha
-            (1000, 50),
-            (1000, 140),
-            (1020, 230, True),
-        ],
-        pigs=[(840, 140), (940, 140), (1040, 140)],  # Cerdos en espacios seguros
-    ),
-    # Nivel 5: Fortalezas independientes
-    LevelData(
-        columns=[
-            # Fortaleza 1
-            (750, 50),
-            (750, 140),
-            (730, 230, True),
-            # Fortaleza 2
-            (900, 50),
-            (900, 140),
-            (900, 230, True),
-            # Fortaleza 3
-            (1050, 50),
-            (1050, 140),
-            (1070, 230, True),
-        ],
-        pigs=[(790, 140), (940, 140), (1090, 140)],  # Cerdos bien espaciados
-    ),
-]
+
+def level_from_dict(data: dict) -> LevelData:
+    """Inverse of dataclasses.asdict for a level, also reads the JSON level files"""
+    physics = data.get("physics")
+    return LevelData(
+        columns=[tuple(column) for column in data["columns"]],
+        pigs=[tuple(pig) for pig in data["pigs"]],
+        physics=PhysicsProfile(**physics) if physics is not None else None,
+    )
+
+
+def _read_json(path: str) -> LevelData:
+    # "name" is only for whoever edits the file
+    with open(path, encoding="utf-8") as f:
+        return level_from_dict(json.load(f))
+
+
+def _write_json(level_data: LevelData, path: str):
+    # One object per line, so the files stay readable and diff well
+    lines = ["{", '  "columns": [']
+    lines.append(",\n".join(f"    {json.dumps(list(column))}" for column in level_data.columns))
+    lines.append("  ],")
+    lines.append('  "pigs": [')
+    lines.append(",\n".join(f"    {json.dumps(list(pig))}" for pig in level_data.pigs))
+    lines.append("  ]" + ("," if level_data.physics is not None else ""))
+    if level_data.physics is not None:
+        lines.append(f'  "physics": {json.dumps(dataclasses.asdict(level_data.physics))}')
+    lines.append("}")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+
+
+def _read_binary(path: str) -> LevelData:
+    with np.load(path) as data:
+        version = int(data["version"])
+        if version != BINARY_FORMAT_VERSION:
+            raise ValueError(f"{path}: unsupported level format version {version}")
+        columns = data["columns"]
+        pigs = data["pigs"]
+        physics = json.loads(str(data["physics"])) if "physics" in data else None
+    return LevelData(
+        columns=[(x, y, True) if horizontal else (x, y) for x, y, horizontal in columns.tolist()],
+        pigs=[(x, y) for x, y in pigs.tolist()],
+        physics=PhysicsProfile(**physics) if physics is not None else None,
+    )
+
+
+def _write_binary(level_data: LevelData, path: str):
+    # Columns as rows of (x, y, horizontal), pigs as rows of (x, y)
+    columns = np.array(
+        [(column[0], column[1], len(column) > 2 and column[2]) for column in level_data.columns],
+        dtype=np.float64,
+    ).reshape(-1, 3)
+    pigs = np.array(level_data.pigs, dtype=np.float64).reshape(-1, 2)
+    arrays = {"version": np.array(BINARY_FORMAT_VERSION), "columns": columns, "pigs": pigs}
+    if level_data.physics is not None:
+        arrays["physics"] = np.array(json.dumps(dataclasses.asdict(level_data.physics)))
+    # np.savez appends .npz to any other name
+    with open(path, "wb") as f:
+        np.savez_compressed(f, **arrays)
+
+
+def read_level(path: str) -> LevelData:
+    """Parse a level file, JSON or binary depending on its extension"""
+    if path.endswith(".npz"):
+        return _read_binary(path)
+    if path.endswith(".json"):
+        return _read_json(path)
+    raise ValueError(f"{path}: level files must end in one of {LEVEL_EXTENSIONS}")
+
+
+def write_level(level_data: LevelData, path: str):
+    """Write a level file, JSON or binary depending on its extension"""
+    if path.endswith(".npz"):
+        _write_binary(level_data, path)
+    elif path.endswith(".json"):
+        _write_json(level_data, path)
+    else:
+        raise ValueError(f"{path}: level files must end in one of {LEVEL_EXTENSIONS}")
+
+
+class LevelSet(Sequence):
+    """
+    Levels stored one per file, in the given order or sorted by name when a
+    directory is given. A file is parsed the first time its level is asked
+    for and only the last level asked for is kept; ``prefetch`` parses a
+    level in a background thread so asking for it later does not wait.
+    """
+
+    def __init__(self, source: Union[str, List[str]]):
+        self.source = source
+        self._paths: Optional[List[str]] = None
+        self._current: Optional[Tuple[int, LevelData]] = None
+        self._pending: Dict[int, Future] = {}
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def paths(self) -> List[str]:
+        # The directory is listed on first use, importing this module never touches the disk
+        if self._paths is None:
+            if isinstance(self.source, str):
+                names = sorted(name for name in os.listdir(self.source) if name.endswith(LEVEL_EXTENSIONS))
+                self._paths = [os.path.join(self.source, name) for name in names]
+            else:
+                self._paths = list(self.source)
+        return self._paths
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+    def _index(self, index: int) -> int:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("level index out of range")
+        return index
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        index = self._index(index)
+        if self._current is not None and self._current[0] == index:
+            return self._current[1]
+        future = self._pending.pop(index, None)
+        level_data = future.result() if future is not None else read_level(self.paths[index])
+        self._current = (index, level_data)
+        return level_data
+
+    def is_ready(self, index: int) -> bool:
+        """True when asking for the level will not wait for its file to be parsed"""
+        index = self._index(index)
+        if self._current is not None and self._current[0] == index:
+            return True
+        future = self._pending.get(index)
+        return future is not None and future.done()
+
+    def prefetch(self, index: int):
+        """Start parsing a level in the background, dropping any older prefetch"""
+        index = self._index(index)
+        if index in self._pending or (self._current is not None and self._current[0] == index):
+            return
+        for future in self._pending.values():
+            future.cancel()
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="level-prefetch")
+        self._pending = {index: self._executor.submit(read_level, self.paths[index])}
+
+
+levels = LevelSet(LEVEL_DIR)
@@ -1,66 +1,128 @@
-import json
+import argparse
 import math
 import logging
+import time
+from typing import Dict, Optional, Sequence, Tuple
 import arcade
-import pymunk
+import numpy as np
 
 from Birds.blue_bird import BlueBird
 from Birds.yellow_bird import YellowBird
-from game_object import Bird, Column, Pig
-from game_logic import get_impulse_vector, Point2D, get_distance
-from levels import levels, LevelData
+from game_object import Bird, Column, Pig, sync_sprites
+from event_trace import EVENT_DRAG, EVENT_PULL, EVENT_RELEASE, EventTrace
+from game_logic import (
+    get_impulse_vector,
+    get_impulse_vectors,
+    predict_trajectories,
+    Point2D,
+    get_distance,
+)
+from level_generator import LAYOUTS, generate_level
+from levels import LevelData, LevelSet, levels
+from profiler import FrameProfiler
+from render import compose_background
+from replay import InputRecorder
+from simulation import (
+    LevelBuild,
+    Simulation,
+    SimObject,
+    WIDTH,
+    HEIGHT,
+    FLOOR_Y,
+    SLINGSHOT_X,
+    SLINGSHOT_Y,
+    MAX_PULL_DISTANCE,
+    STEP_PHASES,
+    BLUE_SPLIT_COUNT,
+    BLUE_SPLIT_SPREAD,
+)
+import textures
 
-logging.basicConfig(level=logging.DEBUG)
+logging.basicConfig(level=logging.INFO)
 logging.getLogger("arcade").setLevel(logging.WARNING)
 logging.getLogger("pymunk").setLevel(logging.WARNING)
 logging.getLogger("PIL").setLevel(logging.WARNING)
 
 logger = logging.getLogger("main")
 
-WIDTH = 1800
-HEIGHT = 800
 TITLE = "Angry birds"
-GRAVITY = -900
+
+# Physics ticks per second, pymunk steps per tick and the most ticks a single
+# frame may run to catch up after a stall
+PHYSICS_RATE = 60
+PHYSICS_SUBSTEPS = 1
+MAX_PHYSICS_STEPS = 5
+
+# Seconds per frame spent building the next level in the background, in
+# batches of this many objects
+LEVEL_BUILD_BUDGET = 0.002
+LEVEL_BUILD_BATCH = 32
+
+# Frame phases timed by the profiler, the simulation's own first, and how
+# many frames pass between refreshes of the profiler overlay text
+PROFILE_PHASES = STEP_PHASES + (
+    "sprites.sync",
+    "check_level_complete",
+    "level_build",
+    "background",
+    "slingshot",
+    "sprites.draw",
+    "hud",
+    "overlay",
+)
+PROFILE_COUNTS = ("collision_callbacks", "bodies", "sprites", "birds", "birds_culled")
+OVERLAY_REFRESH = 15
 
 
 class App(arcade.Window):
-    def __init__(self):
+    def __init__(
+        self,
+        level_list: Optional[Sequence[LevelData]] = None,
+        record: Optional[str] = None,
+        profile: Optional[str] = None,
+        trace: str = "trace.bin",
+        bird_options: Optional[Dict[str, dict]] = None,
+    ):
+        # Decode every texture while the window opens
+        textures.start_preload()
         super().__init__(WIDTH, HEIGHT, TITLE)
-        # Create a sprite list for the background
-        self.background_list = arcade.SpriteList()
-        # Load the background texture
-        background_texture = arcade.load_texture("assets/img/background3.png")
-        
-        # Calculate scale to fit screen
-        scale_width = WIDTH / background_texture.width
-        scale_height = HEIGHT / background_texture.height
-        scale = max(scale_width, scale_height)
-        
-        # Create a background sprite
-        background_sprite = arcade.Sprite(
-            "assets/img/background3.png",
-            scale=scale,
-            center_x=WIDTH // 2,
-            center_y=HEIGHT // 2
-        )
-        self.background_list.append(background_sprite)
-        
+        textures.upload(self.ctx.default_atlas)
+
         # Slingshot parameters
-        self.slingshot_x = 300
-        self.slingshot_y = 80
+        self.slingshot_x = SLINGSHOT_X
+        self.slingshot_y = SLINGSHOT_Y
         self.slingshot_width = 40
-        self.max_pull_distance = 120
+        self.max_pull_distance = MAX_PULL_DISTANCE
 
-        # Create Pymunk space
-        self.space = pymunk.Space()
-        self.space.gravity = (0, GRAVITY)
+        # Background and slingshot frame never change, they are drawn as one window sized sprite
+        self.background_list = arcade.SpriteList()
+        self.background_list.append(
+            arcade.Sprite(self.build_background(), center_x=WIDTH / 2, center_y=HEIGHT / 2)
+        )
 
-        # Add floor
-        floor_body = pymunk.Body(body_type=pymunk.Body.STATIC)
-        floor_shape = pymunk.Segment(floor_body, [0, 30], [WIDTH, 30], 0.0)
-        floor_shape.friction = 0.5  # Menos fricción para que los objetos deslicen más suave
-        floor_shape.elasticity = 0.2  # Menos rebote para evitar daño por impacto
-        self.space.add(floor_body, floor_shape)
+        # Physics runs in the headless simulation, the window only renders it
+        self.simulation = Simulation(dt=1 / PHYSICS_RATE, substeps=PHYSICS_SUBSTEPS, bird_options=bird_options)
+        self.accumulator = 0.0
+        self.simulation.on_spawn = self.add_sprite
+        self.simulation.on_remove = self.remove_sprite
+        # Log of the inputs of this session, see replay.py
+        self.recorder = InputRecorder(record, self.simulation) if record else None
+        # Recent events, written to ``trace_path`` with F4 and when the game crashes
+        self.trace = EventTrace()
+        self.trace_path = trace
+        self.simulation.trace = self.trace
+
+        # Frame timing, shown with F3 and streamed to ``profile`` if given
+        self.simulation.phase_seconds = dict.fromkeys(STEP_PHASES, 0.0)
+        self.profiler = FrameProfiler(PROFILE_PHASES, PROFILE_COUNTS)
+        if profile:
+            self.profiler.open_output(profile)
+        self.collision_callbacks = 0
+        self.birds_culled = 0
+        self.show_profiler = False
+        self.profiler_text = arcade.Text(
+            "", WIDTH - 420, HEIGHT - 30, arcade.color.WHITE, 11, width=400, multiline=True, font_name="Courier New"
+        )
 
         # Birds
         self.bird_types = [Bird, BlueBird, YellowBird]
@@ -68,84 +130,134 @@ class App(arcade.Window):
         self.current_bird_type = self.bird_types[self.current_bird_index]
 
         # Sprites
+        self.sprite_classes = {
+            sprite_class.kind: sprite_class
+            for sprite_class in (Bird, BlueBird, YellowBird, Pig, Column)
+        }
         self.sprites = arcade.SpriteList()
         self.birds = arcade.SpriteList()
         self.world = arcade.SpriteList()
+        self.levels = levels if level_list is None else level_list
         self.current_level = 0
+        # Level index and build of the level that comes after this one, and
+        # the sprite lists its sprites are added to as they are built
+        self.next_level: Optional[Tuple[int, LevelBuild]] = None
+        self.next_sprites = arcade.SpriteList()
+        self.next_world = arcade.SpriteList()
         self.load_level(self.current_level)
 
         # Drag line
         self.start_point = Point2D()
         self.end_point = Point2D()
         self.draw_line = False
+        # Pull point as a (1, 2) array for the trajectory preview
+        self.pull_point = np.zeros((1, 2))
+
+        # HUD, the text is only rebuilt when the values change
+        self.hud_text = arcade.Text("", 20, HEIGHT - 40, arcade.color.BLACK, 18)
+        self.hud_values = None
+
+    def add_sprite(self, model: SimObject):
+        """Show an object spawned in the simulation, reusing the sprite of a pooled bird"""
+        sprite = model.view
+        if sprite is None:
+            sprite = model.view = self.sprite_classes[model.kind](model)
+        elif self.sprites in sprite.sprite_lists:
+            # Built with the level, see prepare_next_level
+            return
+        else:
+            sprite.update()
+        self.sprites.append(sprite)
+        if isinstance(sprite, Bird):
+            self.birds.append(sprite)
+        else:
+            self.world.append(sprite)
 
-        # Collision handler
-        self.handler = self.space.add_default_collision_handler()
-        self.handler.post_solve = self.collision_handler
+    def remove_sprite(self, model: SimObject):
+        model.view.remove_from_sprite_lists()
 
     def load_level(self, level_index: int):
-        self.clear_level()
-        level_data = levels[level_index]
-        self.add_columns(level_data)
-        self.add_pigs(level_data)
-
-    def clear_level(self):
-        for sprite in self.world:
-            self.space.remove(sprite.shape, sprite.body)
+        level_data = self.levels[level_index]
+        if self.recorder is not None:
+            self.recorder.level(level_data)
+        # Switch to the prepared build and its sprite lists when it is this level, else build it now
+        if self.next_level is not None and self.next_level[0] == level_index:
+            build = self.next_level[1]
+            # Birds are pooled, their sprites must not stay in the old lists
+            for sprite in list(self.birds):
+                sprite.remove_from_sprite_lists()
+            self.sprites, self.world = self.next_sprites, self.next_world
+            self.birds = arcade.SpriteList()
+            self.next_sprites = arcade.SpriteList()
+            self.next_world = arcade.SpriteList()
+            self.current_bird = None
+        else:
+            build = self.simulation.prepare_level(level_data)
+            self.clear_sprites()
+        self.next_level = None
+        self.simulation.swap_level(build)
+        # Restarting restores this instead of building the level again
+        self.level_snapshot = build.snapshot()
+        # Parse the next level while this one is played, so finishing it does not stall
+        if isinstance(self.levels, LevelSet):
+            self.levels.prefetch((level_index + 1) % len(self.levels))
+
+    def restart_level(self):
+        """Put the current level back the way it was loaded"""
+        if self.recorder is not None:
+            self.recorder.restart()
+        self.clear_sprites()
+        self.simulation.restore(self.level_snapshot)
+
+    def clear_sprites(self):
         self.world.clear()
         self.birds.clear()
         self.sprites.clear()
-
-    def collision_handler(self, arbiter, space, data):
-        impulse_norm = arbiter.total_impulse.length
-        if impulse_norm < 50:  # Umbral mínimo para detectar colisiones
-            return True
-            
-        logger.debug(impulse_norm)
-        
-        # Verificar si la colisión es con el suelo
-        is_floor_collision = any(shape.body.body_type == pymunk.Body.STATIC for shape in arbiter.shapes)
-        
-        # Manejar destrucción de objetos en colisiones fuertes
-        for obj in self.world:
-            if obj.shape in arbiter.shapes:
-                # Si es una colisión con el suelo, usar un umbral más alto
-                threshold = 2000 if is_floor_collision else 800
-                if impulse_norm > threshold:
-                    obj.remove_from_sprite_lists()
-                    self.space.remove(obj.shape, obj.body)
-                    
-        return True
-
-    def add_columns(self, level_data: LevelData):
-        for column in level_data.columns:
-            if len(column) == 3:
-                x, y, horizontal = column
-            else:
-                x, y = column
-                horizontal = False
-            column = Column(x, y, self.space, horizontal)
-            self.sprites.append(column)
-            self.world.append(column)
-
-    def add_pigs(self, level_data: LevelData):
-        for x, y in level_data.pigs:
-            pig = Pig(x, y, self.space)
-            self.sprites.append(pig)
-            self.world.append(pig)
+        self.current_bird = None
 
     def on_update(self, delta_time: float):
-        self.space.step(1 / 60.0)
-        self.update_collisions()
-        for bird in self.birds:
-            if bird.timer > 4:
-                bird.remove_from_sprite_lists()
-                self.space.remove(bird.shape, bird.body)
-        self.sprites.update()
-        self.check_level_complete()
-
-    def update_collisions(self):
-        pass
+        # Fixed timestep: run as many physics ticks as the elapsed time allows
+        dt = self.simulation.dt
+        self.accumulator += delta_time
+        steps = int(self.accumulator / dt)
+        if steps > MAX_PHYSICS_STEPS:
+            # Drop the backlog instead of falling further behind every frame
+            steps = MAX_PHYSICS_STEPS
+            self.accumulator = steps * dt
+        if steps:
+            self.simulation.step(steps - 1)
+            self.simulation.store_previous_state()
+            self.simulation.step()
+            self.accumulator -= steps * dt
+        # Render between the last two physics states
+        with self.profiler.measure("sprites.sync"):
+            sync_sprites(self.sprites, self.accumulator / dt)
+        with self.profiler.measure("check_level_complete"):
+            self.check_level_complete()
+        with self.profiler.measure("level_build"):
+            self.prepare_next_level()
+
+    def prepare_next_level(self):
+        """
+        Build the next level, and its sprites, a little every frame in a
+        space of its own, so finishing this level or skipping it with LEFT
+        only swaps spaces
+        """
+        if self.next_level is None:
+            index = (self.current_level + 1) % len(self.levels)
+            # Do not wait for the file, it is parsed in the background
+            if isinstance(self.levels, LevelSet) and not self.levels.is_ready(index):
+                return
+            self.next_level = (index, self.simulation.prepare_level(self.levels[index]))
+            self.next_sprites.clear()
+            self.next_world.clear()
+        build = self.next_level[1]
+        deadline = time.perf_counter() + LEVEL_BUILD_BUDGET
+        while not build.done and time.perf_counter() < deadline:
+            for model in build.build(LEVEL_BUILD_BATCH):
+                sprite = model.view = self.sprite_classes[model.kind](model)
+                self.next_sprites.append(sprite)
+                self.next_world.append(sprite)
 
     def on_mouse_press(self, x, y, button, modifiers):
         if button == arcade.MOUSE_BUTTON_LEFT:
@@ -154,7 +266,7 @@ class App(arcade.Window):
                 self.start_point = Point2D(self.slingshot_x, self.slingshot_y)
                 self.end_point = Point2D(x, y)
                 self.draw_line = True
-                logger.debug(f"Start Point: {self.start_point}")
+                self.trace.record(self.simulation.steps, EVENT_PULL, x=x, y=y)
 
     def on_mouse_drag(self, x: int, y: int, dx: int, dy: int, buttons: int, modifiers: int):
         if buttons == arcade.MOUSE_BUTTON_LEFT and self.draw_line:
@@ -165,73 +277,128 @@ class App(arcade.Window):
                 factor = self.max_pull_distance / distance
                 x = self.slingshot_x + dx * factor
                 y = self.slingshot_y + dy * factor
-            self.end_point = Point2D(x, y)
-            logger.debug(f"Dragging to: {self.end_point}")
+            self.end_point.x = x
+            self.end_point.y = y
+            self.trace.record(self.simulation.steps, EVENT_DRAG, x=x, y=y)
 
     def on_mouse_release(self, x: int, y: int, button: int, modifiers: int):
         if button == arcade.MOUSE_BUTTON_LEFT and self.draw_line:
-            logger.debug(f"Releasing from: {self.end_point}")
+            self.trace.record(self.simulation.steps, EVENT_RELEASE, x=self.end_point.x, y=self.end_point.y)
             self.draw_line = False
             impulse_vector = get_impulse_vector(self.start_point, self.end_point)
             self.switch_bird()
-            if self.current_bird_type == Bird:
-                bird = Bird("assets/img/red-bird3.png", 1, impulse_vector, x, y, self.space)
-            elif self.current_bird_type == BlueBird:
-                bird = BlueBird("assets/img/blue.png", 0.2, impulse_vector, x, y, self.space)
-            elif self.current_bird_type == YellowBird:
-                bird = YellowBird("assets/img/yellowBird.png", 0.05, impulse_vector, x, y, self.space)
-            self.sprites.append(bird)
-            self.current_bird = bird
-            self.birds.append(bird)
+            # Launch from the pull point clamped in on_mouse_drag, where the preview starts
+            x, y = self.end_point.x, self.end_point.y
+            if self.recorder is not None:
+                self.recorder.launch(self.current_bird_type.kind, impulse_vector, x, y)
+            self.current_bird = self.simulation.launch(
+                self.current_bird_type.kind, impulse_vector, x, y
+            )
 
     def on_key_press(self, key, modifiers):
-        if key == arcade.key.SPACE and hasattr(self, 'current_bird'):
-            if self.current_bird_type == BlueBird:
-                self.current_bird.power_up(self.space, self.sprites, self.birds)
-            elif self.current_bird_type == YellowBird:
-                self.current_bird.power_up()
+        if key == arcade.key.SPACE and self.current_bird is not None:
+            if self.recorder is not None:
+                self.recorder.power_up()
+            self.simulation.power_up(self.current_bird)
+        elif key == arcade.key.R:
+            self.restart_level()
+        elif key == arcade.key.F3:
+            self.show_profiler = not self.show_profiler
+        elif key == arcade.key.F4:
+            self.dump_trace()
         elif key == arcade.key.LEFT:
             self.current_level += 1
-            if self.current_level >= len(levels):
+            if self.current_level >= len(self.levels):
                 self.current_level = 0
             self.load_level(self.current_level)
 
+    def dump_trace(self):
+        self.trace.dump(self.trace_path)
+        stored = min(self.trace.count, self.trace.capacity)
+        logger.info(f"{stored} of {self.trace.count} traced events written to {self.trace_path}")
+
     def switch_bird(self):
         self.current_bird_index = (self.current_bird_index + 1) % 3
         self.current_bird_type = self.bird_types[self.current_bird_index]
 
     def on_draw(self):
+        profiler = self.profiler
         self.clear()
-        self.background_list.draw()
-        # Slingshot base
-        arcade.draw_lrbt_rectangle_filled(
-            self.slingshot_x - 10,
-            self.slingshot_x + 10,
-            self.slingshot_y - 100,
-            self.slingshot_y,
-            arcade.color.BROWN
-        )
+        with profiler.measure("background"):
+            self.background_list.draw()
+        with profiler.measure("slingshot"):
+            self.draw_slingshot()
+        with profiler.measure("sprites.draw"):
+            self.sprites.draw()
+        with profiler.measure("hud"):
+            self.draw_hud()
+        with profiler.measure("overlay"):
+            if self.show_profiler:
+                self.draw_profiler()
+        self.end_profiler_frame()
+
+    def build_background(self) -> arcade.Texture:
+        """The background image covering the window, with the slingshot frame painted on it"""
+        image = textures.get_texture("assets/img/background3.png").image
+        return arcade.Texture(compose_background(image, self.slingshot_x, self.slingshot_y, self.slingshot_width))
+
+    def draw_slingshot(self):
+        """Rubber band and trajectory preview, the frame is part of the background"""
         left_arm_x = self.slingshot_x - self.slingshot_width
         right_arm_x = self.slingshot_x + self.slingshot_width
         arm_y = self.slingshot_y + 40
-        arcade.draw_line(self.slingshot_x, self.slingshot_y, left_arm_x, arm_y, arcade.color.BROWN, 5)
-        arcade.draw_line(self.slingshot_x, self.slingshot_y, right_arm_x, arm_y, arcade.color.BROWN, 5)
         if self.draw_line:
             arcade.draw_line(left_arm_x, arm_y, self.end_point.x, self.end_point.y, arcade.color.BLACK, 3)
             arcade.draw_line(right_arm_x, arm_y, self.end_point.x, self.end_point.y, arcade.color.BLACK, 3)
-        self.sprites.draw()
+            self.draw_trajectory_preview()
+
+    def end_profiler_frame(self):
+        """Hand the simulation's phase times and this frame's counts to the profiler"""
+        profiler = self.profiler
+        times = self.simulation.phase_seconds
+        for phase, seconds in times.items():
+            profiler.add(phase, seconds)
+            times[phase] = 0.0
+        callbacks = self.simulation.collision_callbacks
+        profiler.count("collision_callbacks", callbacks - self.collision_callbacks)
+        self.collision_callbacks = callbacks
+        profiler.count("bodies", len(self.simulation.objects_by_shape))
+        profiler.count("sprites", len(self.sprites))
+        profiler.count("birds", len(self.simulation.birds))
+        culled = sum(self.simulation.culled.values())
+        profiler.count("birds_culled", culled - self.birds_culled)
+        self.birds_culled = culled
+        profiler.end_frame()
+
+    def draw_profiler(self):
+        if self.profiler.frames % OVERLAY_REFRESH == 0 or not self.profiler_text.text:
+            self.profiler_text.text = "\n".join(self.profiler.report())
+        text = self.profiler_text
+        arcade.draw_lrbt_rectangle_filled(
+            text.left - 10, text.right + 10, text.bottom - 10, text.top + 10, (0, 0, 0, 160)
+        )
+        text.draw()
+
+    def draw_hud(self):
+        values = (self.simulation.pigs_remaining(), self.simulation.score)
+        if values != self.hud_values:
+            self.hud_values = values
+            self.hud_text.text = f"Cerdos: {values[0]}   Puntaje: {values[1]}"
+        self.hud_text.draw()
+
+    def draw_trajectory_preview(self):
+        """Dotted line showing where the bird will fly if released now"""
+        self.pull_point[0] = (self.end_point.x, self.end_point.y)
+        angles, impulses = get_impulse_vectors(self.start_point, self.pull_point)
+        points = predict_trajectories(self.pull_point, angles, impulses)[0]
+        points = points[points[:, 1] > FLOOR_Y]
+        arcade.draw_points(points.tolist(), arcade.color.WHITE, 4)
 
     def check_level_complete(self):
         # Verificar si quedan cerdos en el nivel
-        pigs_remaining = False
-        for sprite in self.world:
-            if isinstance(sprite, Pig):
-                pigs_remaining = True
-                break
-        
-        if not pigs_remaining:
+        if self.simulation.is_level_complete():
             self.current_level += 1
-            if self.current_level < len(levels):
+            if self.current_level < len(self.levels):
                 self.load_level(self.current_level)
             else:
                 print("¡Volviendo al nivel 1!")
@@ -242,8 +409,35 @@ class App(arcade.Window):
 
 
 def main():
-    app = App()
-    arcade.run()
+    parser = argparse.ArgumentParser(description=TITLE)
+    parser.add_argument("--levels", nargs="+", metavar="FILE", help="play these level files instead of the shipped ones")
+    parser.add_argument("--generate", choices=sorted(LAYOUTS), help="play a generated level instead of the shipped ones")
+    parser.add_argument("--columns", type=int, default=1000)
+    parser.add_argument("--pigs", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--record", metavar="FILE", help="write the session's inputs to this log, see replay.py")
+    parser.add_argument("--profile", metavar="FILE", help="write per-frame timings to this .csv or .jsonl file")
+    parser.add_argument("--trace", metavar="FILE", default="trace.bin", help="where F4 and crashes dump the event trace")
+    parser.add_argument("--split-count", type=int, default=BLUE_SPLIT_COUNT, help="birds a blue bird splits into")
+    parser.add_argument("--split-spread", type=float, default=BLUE_SPLIT_SPREAD, help="degrees between the outermost split birds")
+    args = parser.parse_args()
+
+    level_list = None
+    if args.levels:
+        level_list = LevelSet(args.levels)
+    elif args.generate:
+        level_list = [generate_level(args.generate, args.columns, args.pigs, args.seed)]
+    bird_options = {"blue": {"split_count": args.split_count, "split_spread": args.split_spread}}
+    app = App(level_list, args.record, args.profile, args.trace, bird_options)
+    try:
+        arcade.run()
+    except BaseException:
+        # Keep what led up to the crash, decode it with event_trace.py
+        app.dump_trace()
+        raise
+    if app.recorder is not None:
+        app.recorder.close()
+    app.profiler.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,119 @@
+"""
+Frame profiler. Times the phases of every frame and keeps the last few
+seconds of them for the on-screen overlay, and can stream one record per
+frame to a CSV or JSON lines file. Timing a phase costs two perf_counter
+calls, so it stays on even while the overlay is hidden.
+"""
+import csv
+import json
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Sequence, Tuple
+
+# Frames kept for the rolling percentiles
+WINDOW = 240
+
+
+class PhaseTimer:
+    """Context manager adding the time spent inside it to a phase of the current frame"""
+
+    __slots__ = ("profiler", "phase", "start")
+
+    def __init__(self, profiler: "FrameProfiler", phase: str):
+        self.profiler = profiler
+        self.phase = phase
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.profiler.add(self.phase, time.perf_counter() - self.start)
+
+
+class FrameProfiler:
+    """
+    Per-frame phase times and counts. ``phases`` and ``counts`` fix the
+    columns of the output file; the time between two ``end_frame`` calls is
+    recorded as the "frame" phase.
+    """
+
+    def __init__(self, phases: Sequence[str], counts: Sequence[str], window: int = WINDOW):
+        self.phases = ("frame",) + tuple(phases)
+        self.count_names = tuple(counts)
+        self.history: Dict[str, Deque[float]] = {phase: deque(maxlen=window) for phase in self.phases}
+        self.frame: Dict[str, float] = dict.fromkeys(self.phases, 0.0)
+        self.counts: Dict[str, int] = dict.fromkeys(self.count_names, 0)
+        self.frames = 0
+        self.frame_start: Optional[float] = None
+        self.timers = {phase: PhaseTimer(self, phase) for phase in self.phases}
+        self.output = None
+        # Set for CSV output, JSON lines are written directly
+        self.csv_writer: Optional[csv.DictWriter] = None
+
+    def measure(self, phase: str) -> PhaseTimer:
+        return self.timers[phase]
+
+    def add(self, phase: str, seconds: float):
+        self.frame[phase] += seconds
+
+    def count(self, name: str, value: int):
+        self.counts[name] = value
+
+    def end_frame(self):
+        """Close the current frame: push it to the rolling window and the output file"""
+        now = time.perf_counter()
+        if self.frame_start is not None:
+            self.frame["frame"] = now - self.frame_start
+        self.frame_start = now
+
+        for phase, seconds in self.frame.items():
+            self.history[phase].append(seconds)
+        if self.output is not None:
+            self.write_record()
+        self.frames += 1
+        self.frame = dict.fromkeys(self.phases, 0.0)
+
+    def write_record(self):
+        record = {"frame": self.frames}
+        record.update((f"{phase}_ms", round(seconds * 1000, 4)) for phase, seconds in self.frame.items())
+        record.update(self.counts)
+        if self.csv_writer is not None:
+            self.csv_writer.writerow(record)
+        else:
+            self.output.write(json.dumps(record) + "\n")
+
+    def open_output(self, path: str):
+        """Stream every frame from now on to ``path``, CSV or JSON lines depending on its extension"""
+        if not path.endswith((".csv", ".jsonl")):
+            raise ValueError(f"{path}: profile output must be .csv or .jsonl")
+        self.close()
+        self.output = open(path, "w", newline="")
+        if path.endswith(".csv"):
+            fields = ["frame"] + [f"{phase}_ms" for phase in self.phases] + list(self.count_names)
+            self.csv_writer = csv.DictWriter(self.output, fields)
+            self.csv_writer.writeheader()
+
+    def close(self):
+        if self.output is not None:
+            self.output.close()
+            self.output = None
+            self.csv_writer = None
+
+    def percentiles(self, phase: str) -> Tuple[float, float, float]:
+        """p50, p90 and p99 of a phase over the rolling window, in milliseconds"""
+        samples = sorted(self.history[phase])
+        if not samples:
+            return 0.0, 0.0, 0.0
+        n = len(samples)
+        return tuple(samples[min(n - 1, int(n * q))] * 1000 for q in (0.5, 0.9, 0.99))
+
+    def report(self) -> List[str]:
+        """Overlay text: one line per phase and one for the counts"""
+        lines = [f"{'ms':<20}{'p50':>8}{'p90':>8}{'p99':>8}"]
+        for phase in self.phases:
+            p50, p90, p99 = self.percentiles(phase)
+            lines.append(f"{phase:<20}{p50:>8.2f}{p90:>8.2f}{p99:>8.2f}")
+        lines.append("  ".join(f"{name} {value}" for name, value in self.counts.items()))
+        return lines
@@ -0,0 +1,240 @@
+"""
+Offscreen rendering. Draws the scene App.on_draw shows (background,
+slingshot and the bird, pig and column sprites at their body transforms)
+with PIL on the CPU, so it needs neither a display nor a GPU. Headless runs
+are captured one frame per step, rendered on a pool of worker processes and
+streamed in order to ffmpeg, or written as a PNG sequence:
+
+    python render.py --replay session.jsonl --output session.mp4
+    python render.py --level 2 --bird blue --pull 216.9 45.6 --power-up 20 --output shot.mp4
+    python render.py --replay session.jsonl --output frames/ --every 2 --scale 0.5
+"""
+import argparse
+import math
+import os
+import shutil
+import subprocess
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Deque, Dict, List, Optional, Tuple
+
+from PIL import Image, ImageDraw
+
+from levels import levels
+from replay import replay
+from simulation import BIRD_TYPES, HEIGHT, PHYSICS_DT, SLINGSHOT_X, SLINGSHOT_Y, WIDTH, Simulation
+from solver import fire_shot, settled_simulation
+
+BACKGROUND = "assets/img/background3.png"
+SLINGSHOT_WIDTH = 40
+SLINGSHOT_COLOR = (165, 42, 42, 255)  # arcade.color.BROWN
+
+# Image and scale of each kind of object, the same the sprites in game_object.py use
+SPRITES = {
+    "red": ("assets/img/red-bird3.png", 1),
+    "blue": ("assets/img/blue.png", 0.2),
+    "yellow": ("assets/img/yellowBird.png", 0.05),
+    "pig": ("assets/img/pig_failed.png", 0.1),
+    "column": ("assets/img/column.png", 1),
+}
+
+# Rotated sprites are cached at this angle resolution, in degrees
+ANGLE_STEP = 1
+
+# Frames per job sent to the workers, and jobs in flight per worker
+CHUNK_FRAMES = 16
+JOBS_PER_WORKER = 2
+
+VIDEO_EXTENSIONS = (".mp4", ".mkv", ".webm", ".mov", ".avi")
+
+# One frame: kind, x, y and angle of every object, in spawn (drawing) order
+Frame = List[Tuple[str, float, float, float]]
+
+
+def compose_background(
+    image: Image.Image,
+    slingshot_x: float = SLINGSHOT_X,
+    slingshot_y: float = SLINGSHOT_Y,
+    slingshot_width: float = SLINGSHOT_WIDTH,
+) -> Image.Image:
+    """
+    ``image`` scaled and cropped to cover the window, with the slingshot
+    frame painted on it. App draws this same image as its background.
+    """
+    scale = max(WIDTH / image.width, HEIGHT / image.height)
+    width, height = round(image.width * scale), round(image.height * scale)
+    left, top = (width - WIDTH) // 2, (height - HEIGHT) // 2
+    image = image.convert("RGBA").resize((width, height)).crop((left, top, left + WIDTH, top + HEIGHT))
+
+    # PIL counts y from the top of the image
+    draw = ImageDraw.Draw(image)
+    x, y = slingshot_x, HEIGHT - slingshot_y
+    # Slingshot base
+    draw.rectangle((x - 10, y, x + 10, y + 100), fill=SLINGSHOT_COLOR)
+    for arm_x in (x - slingshot_width, x + slingshot_width):
+        draw.line((x, y, arm_x, y - 40), fill=SLINGSHOT_COLOR, width=5)
+    return image
+
+
+def capture(sim: Simulation) -> Frame:
+    return [(obj.kind, *obj.body.position, obj.body.angle) for obj in sim.objects_by_shape.values()]
+
+
+class FrameRenderer:
+    """Composites frames at ``scale`` times the window size"""
+
+    def __init__(self, scale: float = 1.0):
+        self.scale = scale
+        # Even sizes, most video encoders need them
+        self.width = round(WIDTH * scale / 2) * 2
+        self.height = round(HEIGHT * scale / 2) * 2
+        background = compose_background(Image.open(BACKGROUND))
+        self.background = background.resize((self.width, self.height)).convert("RGB")
+        self.sprites: Dict[str, Image.Image] = {}
+        for kind, (path, sprite_scale) in SPRITES.items():
+            image = Image.open(path).convert("RGBA")
+            size = (max(1, round(image.width * sprite_scale * scale)), max(1, round(image.height * sprite_scale * scale)))
+            self.sprites[kind] = image.resize(size, Image.LANCZOS)
+        self.rotated: Dict[Tuple[str, int], Image.Image] = {}
+
+    def sprite(self, kind: str, angle: float) -> Image.Image:
+        # The game shows body angles as clockwise sprite angles, PIL rotates counterclockwise
+        step = round(math.degrees(angle) / ANGLE_STEP) % round(360 / ANGLE_STEP)
+        key = (kind, step)
+        image = self.rotated.get(key)
+        if image is None:
+            image = self.rotated[key] = self.sprites[kind].rotate(-step * ANGLE_STEP, Image.BICUBIC, expand=True)
+        return image
+
+    def render(self, frame: Frame) -> Image.Image:
+        image = self.background.copy()
+        scale = self.scale
+        for kind, x, y, angle in frame:
+            sprite = self.sprite(kind, angle)
+            left = round(x * scale - sprite.width / 2)
+            top = round(self.height - y * scale - sprite.height / 2)
+            if left < self.width and top < self.height and left + sprite.width > 0 and top + sprite.height > 0:
+                image.paste(sprite, (left, top), sprite)
+        return image
+
+
+# Renderer of each worker process, built once by _init_worker
+_renderer: Optional[FrameRenderer] = None
+
+
+def _init_worker(scale: float):
+    global _renderer
+    _renderer = FrameRenderer(scale)
+
+
+def _render_chunk(first: int, frames: List[Frame], directory: Optional[str]) -> List[bytes]:
+    """Render frames numbered from ``first``: written as PNGs to ``directory``, else returned as raw RGB"""
+    images = [_renderer.render(frame) for frame in frames]
+    if directory is None:
+        return [image.tobytes() for image in images]
+    for i, image in enumerate(images, first):
+        image.save(os.path.join(directory, f"frame_{i:06d}.png"), compress_level=1)
+    return []
+
+
+class FrameExporter:
+    """
+    Streaming export: frames added with ``add`` are rendered in chunks on a
+    process pool while the simulation keeps running, and written in order.
+    At most JOBS_PER_WORKER chunks per worker are in flight, so memory stays
+    bounded however long the run is. Use as a context manager.
+    """
+
+    def __init__(self, output: str, fps: float, scale: float = 1.0, workers: Optional[int] = None):
+        width, height = round(WIDTH * scale / 2) * 2, round(HEIGHT * scale / 2) * 2
+        self.encoder = None
+        self.directory = None
+        if output.lower().endswith(VIDEO_EXTENSIONS):
+            if shutil.which("ffmpeg") is None:
+                raise RuntimeError(f"{output}: video output needs ffmpeg, give a directory to write PNG frames instead")
+            # ffmpeg encodes raw frames from its stdin
+            self.encoder = subprocess.Popen(
+                [
+                    "ffmpeg", "-y", "-loglevel", "error",
+                    "-f", "rawvideo", "-pix_fmt", "rgb24", "-s", f"{width}x{height}", "-r", f"{fps:g}",
+                    "-i", "-",
+                    "-pix_fmt", "yuv420p", output,
+                ],
+                stdin=subprocess.PIPE,
+            )
+        else:
+            self.directory = output
+            os.makedirs(output, exist_ok=True)
+
+        workers = workers or os.cpu_count() or 1
+        self.max_jobs = workers * JOBS_PER_WORKER
+        self.executor = ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(scale,))
+        self.jobs: Deque = deque()
+        self.chunk: List[Frame] = []
+        self.frames = 0
+
+    def add(self, frame: Frame):
+        self.chunk.append(frame)
+        if len(self.chunk) == CHUNK_FRAMES:
+            self.submit()
+
+    def submit(self):
+        if self.chunk:
+            self.jobs.append(self.executor.submit(_render_chunk, self.frames, self.chunk, self.directory))
+            self.frames += len(self.chunk)
+            self.chunk = []
+        while len(self.jobs) > self.max_jobs:
+            self.write(self.jobs.popleft())
+
+    def write(self, job):
+        for data in job.result():
+            self.encoder.stdin.write(data)
+
+    def close(self):
+        self.submit()
+        while self.jobs:
+            self.write(self.jobs.popleft())
+        self.executor.shutdown()
+        if self.encoder is not None:
+            self.encoder.stdin.close()
+            if self.encoder.wait():
+                raise RuntimeError(f"ffmpeg exited with status {self.encoder.returncode}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render a headless run to a video or PNG frames")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--replay", metavar="LOG", help="recorded session, see replay.py")
+    source.add_argument("--level", type=int, help="level number of a single shot, as solver.py prints it")
+    parser.add_argument("--bird", choices=sorted(BIRD_TYPES), default="red")
+    parser.add_argument("--pull", type=float, nargs=2, default=(200, 40), metavar=("X", "Y"))
+    parser.add_argument("--power-up", type=int, help="step after launch at which to power up")
+    parser.add_argument("--output", required=True, help="video file (needs ffmpeg) or directory for PNG frames")
+    parser.add_argument("--every", type=int, default=1, help="render one frame every N physics steps")
+    parser.add_argument("--scale", type=float, default=1.0, help="frame size relative to the window")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    with FrameExporter(args.output, 1 / (PHYSICS_DT * args.every), args.scale, args.workers) as exporter:
+
+        def on_step(sim: Simulation):
+            if sim.steps % args.every == 0:
+                exporter.add(capture(sim))
+
+        if args.replay:
+            replay(args.replay, on_step)
+        else:
+            sim = settled_simulation(levels[args.level - 1], settle_steps=60)
+            sim.on_step = on_step
+            fire_shot(sim, args.bird, *args.pull, args.power_up)
+    print(f"{exporter.frames} frames written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
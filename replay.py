@@ -0,0 +1,166 @@
+"""
+Input recording and headless replay. The game writes every input that
+changes the simulation (level loads and restarts, bird launches and power
+ups) to a JSON lines log, tagged with the physics step it came before, plus
+the result of every level attempt. Replaying a log feeds the same inputs to
+a bare Simulation as fast as the CPU allows and checks the results, so
+recorded sessions work as regression tests for physics changes.
+
+    python main.py --record session.jsonl
+    python replay.py session.jsonl
+"""
+import argparse
+import dataclasses
+import json
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional
+
+from game_logic import ImpulseVector
+from levels import LevelData, level_from_dict
+from simulation import MAX_LIVE_BIRDS, Simulation
+
+LOG_VERSION = 1
+
+
+class InputRecorder:
+    """
+    Writes the inputs applied to ``simulation`` to a log file. The first
+    line holds the simulation settings, every other line is an event.
+    """
+
+    def __init__(self, path: str, simulation: Simulation):
+        self.simulation = simulation
+        self.file = open(path, "w")
+        self.level_loaded = False
+        self.write(
+            {
+                "version": LOG_VERSION,
+                "dt": simulation.dt,
+                "substeps": simulation.substeps,
+                "gravity": simulation.gravity,
+                "max_live_birds": simulation.max_live_birds,
+                "bird_options": simulation.bird_options,
+            }
+        )
+
+    def write(self, record: dict):
+        self.file.write(json.dumps(record, separators=(",", ":")) + "\n")
+
+    def event(self, event: str, **fields):
+        self.write({"step": self.simulation.steps, "event": event, **fields})
+
+    def result(self):
+        """Record the result of the level attempt that is ending"""
+        if self.level_loaded:
+            self.event("result", score=self.simulation.score, destroyed=dict(self.simulation.destroyed))
+
+    def level(self, level_data: LevelData):
+        # The level goes in the log, so it replays the same after the level files change
+        self.result()
+        self.level_loaded = True
+        self.event("level", level=dataclasses.asdict(level_data))
+
+    def restart(self):
+        self.result()
+        self.event("restart")
+
+    def launch(self, bird_type: str, impulse_vector: ImpulseVector, x: float, y: float):
+        self.event("launch", bird=bird_type, angle=impulse_vector.angle, impulse=impulse_vector.impulse, x=x, y=y)
+
+    def power_up(self):
+        self.event("power_up")
+
+    def close(self):
+        self.result()
+        self.file.close()
+
+
+@dataclass
+class ReplayResult:
+    steps: int
+    seconds: float
+    levels: int = 0
+    launches: int = 0
+    # Level attempts that did not end the way they were recorded
+    mismatches: List[str] = field(default_factory=list)
+
+
+def replay(path: str, on_step: Optional[Callable[[Simulation], None]] = None) -> ReplayResult:
+    """
+    Run a recorded session on a headless simulation, without stopping
+    between steps. ``on_step`` is called after every step, see render.py.
+    """
+    start = time.perf_counter()
+    with open(path) as f:
+        header = json.loads(f.readline())
+        if header.get("version") != LOG_VERSION:
+            raise ValueError(f"{path}: unsupported log version {header.get('version')}")
+        sim = Simulation(
+            gravity=header["gravity"],
+            dt=header["dt"],
+            substeps=header["substeps"],
+            # Logs from before these settings were recorded used the defaults
+            max_live_birds=header.get("max_live_birds", MAX_LIVE_BIRDS),
+            bird_options=header.get("bird_options"),
+        )
+        sim.on_step = on_step
+        result = ReplayResult(0, 0.0)
+        snapshot = None
+        bird = None
+
+        for line in f:
+            record = json.loads(line)
+            sim.step(record["step"] - sim.steps)
+            event = record["event"]
+            if event == "level":
+                sim.load_level(level_from_dict(record["level"]))
+                # Restarts restore the level like the game does
+                snapshot = sim.snapshot()
+                bird = None
+                result.levels += 1
+            elif event == "restart":
+                sim.restore(snapshot)
+                bird = None
+            elif event == "launch":
+                impulse_vector = ImpulseVector(record["angle"], record["impulse"])
+                bird = sim.launch(record["bird"], impulse_vector, record["x"], record["y"])
+                result.launches += 1
+            elif event == "power_up":
+                sim.power_up(bird)
+            elif event == "result":
+                destroyed = dict(sim.destroyed)
+                if sim.score != record["score"] or destroyed != record["destroyed"]:
+                    result.mismatches.append(
+                        f"step {record['step']}: score {sim.score}, destroyed {destroyed}, "
+                        f"recorded {record['score']}, {record['destroyed']}"
+                    )
+            else:
+                raise ValueError(f"{path}: unknown event {event!r}")
+
+    result.steps = sim.steps
+    result.seconds = time.perf_counter() - start
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded sessions and check their results")
+    parser.add_argument("logs", nargs="+")
+    args = parser.parse_args()
+
+    failed = False
+    for path in args.logs:
+        result = replay(path)
+        print(
+            f"{path}: {result.levels} levels, {result.launches} launches, {result.steps} steps "
+            f"in {result.seconds:.2f} s ({result.steps / result.seconds:.0f} steps/s)"
+        )
+        for mismatch in result.mismatches:
+            print(f"  {mismatch}")
+        failed = failed or bool(result.mismatches)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
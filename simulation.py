@@ -0,0 +1,1028 @@
+"""
+Headless simulation core. Owns the pymunk space, the floor, level loading,
+the collision/destruction rules and the bird lifetime. Nothing in this module
+depends on arcade, so levels can be stepped on machines without a display.
+"""
+import itertools
+import math
+import time
+import weakref
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+import pymunk
+
+from event_trace import (
+    EVENT_DESTROY,
+    EVENT_LAUNCH,
+    EVENT_LEVEL,
+    EVENT_POWER_UP,
+    EVENT_RESTORE,
+    KIND_CODES,
+    EventTrace,
+)
+from game_logic import ImpulseVector
+from levels import LevelData, PhysicsProfile
+
+WIDTH = 1800
+HEIGHT = 800
+GRAVITY = -900
+FLOOR_Y = 30
+PHYSICS_DT = 1 / 60.0
+BIRD_LIFETIME = 4
+# Birds are also culled once they leave the world by this many pixels to
+# the sides or below the floor, after resting slower than BIRD_REST_SPEED
+# for BIRD_REST_TIME seconds, and the oldest ones when more than
+# MAX_LIVE_BIRDS are alive
+BIRD_CULL_MARGIN = 100
+BIRD_REST_SPEED = 5
+BIRD_REST_TIME = 1.0
+MAX_LIVE_BIRDS = 12
+
+# Blue bird split: birds flying after the power up, the parent included,
+# and the angle in degrees between the outermost two
+BLUE_SPLIT_COUNT = 3
+BLUE_SPLIT_SPREAD = 60
+# Released birds kept for reuse, per bird type
+BIRD_POOL_SIZE = 32
+
+# Slingshot, birds are launched from pull points around it
+SLINGSHOT_X = 300
+SLINGSHOT_Y = 80
+MAX_PULL_DISTANCE = 120
+
+# Impulse needed to break a pig or a column
+DAMAGE_THRESHOLD = 800
+FLOOR_DAMAGE_THRESHOLD = 2000
+# Contacts weaker than this are neither traced nor checked for damage, and
+# do not disturb objects at rest
+MIN_IMPULSE = 50
+
+# Health of pigs and columns, in hits at the damage threshold. A contact
+# over the threshold takes its whole impulse in hits (1.5 for one at 1.5x
+# the threshold) and weaker ones take nothing, so resting loads never wear
+# an object down; at 1 any hit over the threshold breaks it.
+PIG_HEALTH = 1.0
+COLUMN_HEALTH = 1.0
+
+# Points for each destroyed pig or column
+PIG_SCORE = 5000
+COLUMN_SCORE = 500
+
+# Collision types used to register per-pair handlers in the space. Pigs and
+# columns start a level with the *_AT_REST types, which have no handler
+# among themselves or with the floor, so the resting contacts of a standing
+# level never call into Python. They switch for good to the plain types once
+# a bird or a disturbed object hits them, see Simulation.disturb.
+COLLISION_BIRD = 1
+COLLISION_PIG = 2
+COLLISION_COLUMN = 3
+COLLISION_FLOOR = 4
+COLLISION_PIG_AT_REST = 5
+COLLISION_COLUMN_AT_REST = 6
+# Contacts among these have no handler
+RESTING_TYPES = {COLLISION_PIG_AT_REST, COLLISION_COLUMN_AT_REST, COLLISION_FLOOR}
+
+# Shape filter categories. Birds do not collide with each other, a contact
+# that could never damage anything, so pymunk drops those pairs before the
+# narrow phase.
+CATEGORY_BIRD = 1 << 0
+CATEGORY_PIG = 1 << 1
+CATEGORY_COLUMN = 1 << 2
+CATEGORY_FLOOR = 1 << 3
+BIRD_FILTER = pymunk.ShapeFilter(categories=CATEGORY_BIRD, mask=pymunk.ShapeFilter.ALL_MASKS() ^ CATEGORY_BIRD)
+PIG_FILTER = pymunk.ShapeFilter(categories=CATEGORY_PIG)
+COLUMN_FILTER = pymunk.ShapeFilter(categories=CATEGORY_COLUMN)
+FLOOR_FILTER = pymunk.ShapeFilter(categories=CATEGORY_FLOOR)
+
+# Physical sizes, matching the sprites drawn for them
+PIG_RADIUS = 388 * 0.1 / 2 - 3  # pig_failed.png at scale 0.1
+COLUMN_WIDTH = 25  # column.png at scale 1
+COLUMN_HEIGHT = 90
+PIG_MASS = 12
+COLUMN_MASS = 15
+
+# Phases of Simulation.step timed in Simulation.phase_seconds
+STEP_PHASES = ("space.step", "bird_expiry", "update_collisions", "bird_update")
+
+# Physics profile tuning: seconds at rest before a body sleeps and object
+# count from which a spatial hash beats the bounding box tree
+SLEEP_TIME_THRESHOLD = 0.5
+SPATIAL_HASH_MIN_OBJECTS = 200
+
+
+class SimObject:
+    """
+    A physical game object: a pymunk body and its shape. ``kind`` identifies
+    the object type so renderers can pick a sprite for it.
+    """
+
+    kind = ""
+    # Renderer-owned object (a sprite) bound to this model. It is kept while
+    # a pooled bird is reused, so the body, shape and sprite travel together.
+    view = None
+    # Collision types of the object once disturbed and while at rest, see Simulation.disturb
+    collision_type = 0
+    rest_collision_type = 0
+    _ids = itertools.count(1)
+
+    def __init__(self, body: pymunk.Body, shape: pymunk.Shape, health: float = math.inf):
+        self.body = body
+        self.shape = shape
+        # Damage left before the object breaks, see Simulation.update_collisions
+        self.health = health
+        # Names the object in the event trace, 0 is left for the floor
+        self.id = next(SimObject._ids)
+        self.store_previous_state()
+
+    def store_previous_state(self):
+        """Remember the current transform, renderers interpolate from it"""
+        self.previous_position = self.body.position
+        self.previous_angle = self.body.angle
+
+    def state(self) -> Tuple:
+        """Body state, health and collision type (at rest or disturbed), as Snapshot records them"""
+        body = self.body
+        return body.position, body.velocity, body.angle, body.angular_velocity, self.health, self.shape.collision_type
+
+    def interpolate(self, alpha: float) -> Tuple[float, float, float]:
+        """
+        Position and angle ``alpha`` of the way between the previous stored
+        state and the current one, as ``(x, y, angle)``
+        """
+        x0, y0 = self.previous_position
+        x1, y1 = self.body.position
+        angle0 = self.previous_angle
+        angle1 = self.body.angle
+        return (
+            x0 + (x1 - x0) * alpha,
+            y0 + (y1 - y0) * alpha,
+            angle0 + (angle1 - angle0) * alpha,
+        )
+
+    def update(self, simulation: "Simulation", delta_time: float):
+        pass
+
+
+class SimBird(SimObject):
+    """
+    Red bird. The launch impulse is applied once at creation, after that the
+    bird is just a circle flying through the space.
+    """
+
+    kind = "red"
+    elasticity = 0.4
+    friction = 0.7
+
+    def __init__(
+        self,
+        impulse_vector: ImpulseVector,
+        x: float,
+        y: float,
+        mass: float = 5,
+        radius: float = 12,
+        max_impulse: float = 100,
+        power_multiplier: float = 50,
+    ):
+        moment = pymunk.moment_for_circle(mass, 0, radius)
+        body = pymunk.Body(mass, moment)
+        # shape
+        shape = pymunk.Circle(body, radius)
+        shape.elasticity = self.elasticity
+        shape.friction = self.friction
+        shape.collision_type = COLLISION_BIRD
+        shape.filter = BIRD_FILTER
+
+        super().__init__(body, shape)
+        self.max_impulse = max_impulse
+        self.power_multiplier = power_multiplier
+        self.reset(impulse_vector, x, y)
+
+    def reset(self, impulse_vector: ImpulseVector, x: float, y: float):
+        """Put the bird at ``(x, y)`` at rest and throw it again, used when reusing a pooled bird"""
+        body = self.body
+        # Clear the solver's bias velocity left from the last flight, see Simulation.restore
+        pymunk.Body.update_position(body, 0)
+        body.position = (x, y)
+        body.velocity = (0, 0)
+        body.angle = 0
+        body.angular_velocity = 0
+        body.force = (0, 0)
+        body.torque = 0
+
+        impulse = min(self.max_impulse, impulse_vector.impulse) * self.power_multiplier
+        impulse_pymunk = impulse * pymunk.Vec2d(1, 0)
+        # apply impulse
+        body.apply_impulse_at_local_point(impulse_pymunk.rotated(impulse_vector.angle))
+        self.timer = 0
+        # Seconds spent slower than BIRD_REST_SPEED without a break
+        self.rest_time = 0
+        self.store_previous_state()
+
+    def update(self, simulation: "Simulation", delta_time: float):
+        self.timer += delta_time
+        if self.body.velocity.length < BIRD_REST_SPEED:
+            self.rest_time += delta_time
+        else:
+            self.rest_time = 0
+
+    def power_up(self, simulation: "Simulation"):
+        pass
+
+
+class SimBlueBird(SimBird):
+    """
+    Blue bird, splits on power up into a fan of ``split_count`` birds with
+    the same speed, ``split_spread`` degrees wide and centred on its
+    direction. Birds do not collide with each other, so the split birds
+    spawn on top of each other without pushing apart.
+    """
+
+    kind = "blue"
+    elasticity = 0.8
+    friction = 1
+
+    def __init__(
+        self, *args, split_count: int = BLUE_SPLIT_COUNT, split_spread: float = BLUE_SPLIT_SPREAD, **kwargs
+    ):
+        super().__init__(*args, **kwargs)
+        self.split_count = split_count
+        self.split_spread = split_spread
+
+    def split_angles(self) -> List[float]:
+        """Direction change of each bird of the split, in radians and fan order"""
+        if self.split_count < 2:
+            return [0.0]
+        spacing = math.radians(self.split_spread) / (self.split_count - 1)
+        middle = (self.split_count - 1) / 2
+        return [(i - middle) * spacing for i in range(self.split_count)]
+
+    def power_up(self, simulation: "Simulation"):
+        self.update(simulation, simulation.dt)
+        velocity = self.body.velocity
+        x, y = self.body.position
+        angles = self.split_angles()
+        # The bird itself takes the direction closest to its own
+        own = angles.pop((len(angles) - 1) // 2)
+        self.body.velocity = velocity.rotated(own)
+        simulation.spawn_birds(self.kind, x, y, [velocity.rotated(angle) for angle in angles])
+
+
+class SimYellowBird(SimBird):
+    """Yellow bird, keeps pushing along its velocity once powered up"""
+
+    kind = "yellow"
+    elasticity = 0.8
+    friction = 1
+
+    def __init__(self, *args, boost_multiplier: float = 3.0, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.boost_multiplier = boost_multiplier
+
+    def reset(self, impulse_vector: ImpulseVector, x: float, y: float):
+        super().reset(impulse_vector, x, y)
+        self.is_boosted = False
+
+    def update(self, simulation: "Simulation", delta_time: float):
+        super().update(simulation, delta_time)
+        if self.is_boosted:
+            # Aplicar un impulso en la misma dirección que la velocidad
+            impulse = 300.0 * self.boost_multiplier
+            self.body.apply_impulse_at_local_point(
+                impulse * self.body.velocity.normalized()
+            )
+
+    def power_up(self, simulation: "Simulation"):
+        self.is_boosted = True
+        self.update(simulation, simulation.dt)
+
+
+class SimPig(SimObject):
+    kind = "pig"
+    collision_type = COLLISION_PIG
+    rest_collision_type = COLLISION_PIG_AT_REST
+
+    def __init__(
+        self,
+        x: float,
+        y: float,
+        mass: float = PIG_MASS,  # Mayor masa para más estabilidad
+        elasticity: float = 0.2,  # Menos rebote para reducir daño por caídas
+        friction: float = 0.8,  # Más fricción para mejor estabilidad
+        health: float = PIG_HEALTH,
+    ):
+        moment = pymunk.moment_for_circle(mass, 0, PIG_RADIUS)
+        body = pymunk.Body(mass, moment)
+        body.position = (x, y)
+        body.moment = moment * 0.8  # Aumentar el momento de inercia para más estabilidad
+
+        shape = pymunk.Circle(body, PIG_RADIUS)
+        shape.elasticity = elasticity
+        shape.friction = friction
+        shape.collision_type = self.rest_collision_type
+        shape.filter = PIG_FILTER
+        super().__init__(body, shape, health)
+
+
+class SimColumn(SimObject):
+    kind = "column"
+    collision_type = COLLISION_COLUMN
+    rest_collision_type = COLLISION_COLUMN_AT_REST
+
+    def __init__(
+        self,
+        x: float,
+        y: float,
+        horizontal: bool = False,
+        mass: float = COLUMN_MASS,  # Mayor masa para más estabilidad
+        elasticity: float = 0.3,  # Menos rebote
+        friction: float = 0.9,  # Más fricción para mejor agarre
+        health: float = COLUMN_HEALTH,
+    ):
+        moment = pymunk.moment_for_box(mass, (COLUMN_WIDTH, COLUMN_HEIGHT))
+        body = pymunk.Body(mass, moment)
+        body.moment = moment * 0.7  # Reduce el momento de inercia para que gire más fácilmente
+        body.position = (x, y)
+
+        if horizontal:
+            body.angle = math.pi / 2
+            shape = pymunk.Poly.create_box(body, (COLUMN_HEIGHT, COLUMN_WIDTH))
+            shape.mass = mass
+        else:
+            shape = pymunk.Poly.create_box(body, (COLUMN_WIDTH, COLUMN_HEIGHT))
+        shape.elasticity = elasticity
+        shape.friction = friction
+        shape.collision_type = self.rest_collision_type
+        shape.filter = COLUMN_FILTER
+        super().__init__(body, shape, health)
+        self.horizontal = horizontal
+
+
+BIRD_TYPES = {
+    SimBird.kind: SimBird,
+    SimBlueBird.kind: SimBlueBird,
+    SimYellowBird.kind: SimYellowBird,
+}
+
+
+class BirdPool:
+    """
+    Free list of removed birds of one type. Launching takes a bird from here
+    when there is one instead of allocating a new body, shape and sprite. At
+    most ``max_size`` released birds are kept.
+    """
+
+    def __init__(self, bird_class: type, max_size: int = BIRD_POOL_SIZE, **bird_options):
+        self.bird_class = bird_class
+        self.max_size = max_size
+        # Keyword arguments for new birds, e.g. split_count for blue birds
+        self.bird_options = bird_options
+        self.free: List[SimBird] = []
+        self.hits = 0
+        self.misses = 0
+
+    def acquire(self, impulse_vector: ImpulseVector, x: float, y: float) -> SimBird:
+        if self.free:
+            self.hits += 1
+            bird = self.free.pop()
+            bird.reset(impulse_vector, x, y)
+            return bird
+        self.misses += 1
+        return self.bird_class(impulse_vector, x, y, **self.bird_options)
+
+    def release(self, bird: SimBird):
+        if len(self.free) < self.max_size:
+            self.free.append(bird)
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "free": len(self.free)}
+
+
+@dataclass
+class Snapshot:
+    """
+    State of a level at one moment: the live pigs and columns with their
+    body states (position, velocity, angle, angular velocity), health and
+    collision type, and the level counters. Birds in flight are not part of it.
+    """
+
+    objects: List[Tuple[SimObject, Tuple]]
+    profile: PhysicsProfile
+    floor_width: float
+    destroyed: Counter
+
+
+def level_objects(level_data: LevelData) -> Iterator[SimObject]:
+    """The columns and then the pigs of a level, built one at a time"""
+    for column in level_data.columns:
+        if len(column) == 3:
+            x, y, horizontal = column
+        else:
+            x, y = column
+            horizontal = False
+        yield SimColumn(x, y, horizontal)
+    for x, y in level_data.pigs:
+        yield SimPig(x, y)
+
+
+class LevelBuild:
+    """
+    A level being built in a space of its own while another one is played.
+    ``build`` adds objects a batch at a time, Simulation.swap_level puts the
+    finished space in place of the running one.
+    """
+
+    def __init__(self, simulation: "Simulation", level_data: LevelData, profile: Optional[PhysicsProfile] = None):
+        if profile is None:
+            profile = level_data.physics or derive_physics_profile(level_data)
+        self.level_data = level_data
+        self.profile = profile
+        # Generated levels can be wider than the window, the floor has to hold them
+        xs = [column[0] for column in level_data.columns] + [x for x, _ in level_data.pigs]
+        self.floor_width = max(WIDTH, max(xs, default=0) + COLUMN_HEIGHT)
+        self.space = simulation.create_space(profile, self.floor_width)
+        self.objects: List[SimObject] = []
+        # Initial state of every object, for the snapshot of the level as loaded
+        self.states: List[Tuple[SimObject, Tuple]] = []
+        self.pending = level_objects(level_data)
+        self.done = False
+
+    def build(self, max_objects: Optional[int] = None) -> List[SimObject]:
+        """Add up to ``max_objects`` more objects (all of them by default), returns the new ones"""
+        built = list(itertools.islice(self.pending, max_objects))
+        for obj in built:
+            self.space.add(obj.body, obj.shape)
+            self.states.append((obj, obj.state()))
+        self.objects.extend(built)
+        if max_objects is None or len(built) < max_objects:
+            self.done = True
+        return built
+
+    def snapshot(self) -> Snapshot:
+        """
+        Snapshot of the level as built, the same Simulation.snapshot takes
+        right after swapping it in but without reading the bodies again
+        """
+        return Snapshot(list(self.states), self.profile, self.floor_width, Counter())
+
+
+def derive_physics_profile(level_data: LevelData) -> PhysicsProfile:
+    """
+    Physics profile for a level from its contents: object count, bounding box
+    and typical object size. Every level lets bodies at rest sleep, tall
+    stacks get more solver iterations and large levels use a spatial hash
+    sized to their objects.
+    """
+    n_columns = len(level_data.columns)
+    n_pigs = len(level_data.pigs)
+    n_objects = n_columns + n_pigs
+    profile = PhysicsProfile(sleep_time_threshold=SLEEP_TIME_THRESHOLD)
+    if n_objects == 0:
+        return profile
+
+    ys = [column[1] for column in level_data.columns] + [y for _, y in level_data.pigs]
+    layers = round((max(ys) - min(ys)) / COLUMN_HEIGHT) + 1
+    # Las torres altas necesitan más iteraciones para no derrumbarse solas
+    profile.iterations = 10 + 2 * max(0, layers - 3)
+
+    if n_objects >= SPATIAL_HASH_MIN_OBJECTS:
+        # Cell size around the average object size, about ten cells per object
+        profile.spatial_hash_dim = (n_columns * COLUMN_HEIGHT + n_pigs * 2 * PIG_RADIUS) / n_objects
+        profile.spatial_hash_count = 10 * n_objects
+    return profile
+
+
+def _damage_post_solve(arbiter, space, data):
+    return data["simulation"].collision_handler(arbiter, space, data)
+
+
+class Simulation:
+    """
+    Pure pymunk game simulation. Renderers subscribe to ``on_spawn`` and
+    ``on_remove`` to keep their own view of the objects in sync.
+
+    Each call to ``step`` advances the game by one fixed tick of ``dt``
+    seconds, split into ``substeps`` pymunk steps.
+    """
+
+    def __init__(
+        self,
+        gravity: float = GRAVITY,
+        dt: float = PHYSICS_DT,
+        substeps: int = 1,
+        bird_pool_size: int = BIRD_POOL_SIZE,
+        max_live_birds: int = MAX_LIVE_BIRDS,
+        bird_options: Optional[Dict[str, dict]] = None,
+    ):
+        """
+        ``bird_options`` maps bird types to keyword arguments for their
+        constructor, e.g. ``{"blue": {"split_count": 30}}``. ``max_live_birds``
+        is raised to the largest ``split_count`` in it, so the birds of one
+        split are never culled for being too many.
+        """
+        self.dt = dt
+        self.substeps = substeps
+        self.gravity = gravity
+        self.profile = PhysicsProfile()
+        self.floor_width = WIDTH
+        self.space = self.create_space(self.profile)
+
+        # Shape -> game object registry, used by the collision handlers
+        self.objects_by_shape = {}
+        # Live objects per kind and objects destroyed per kind in this level,
+        # kept up to date on spawn and removal so counts are O(1) reads
+        self.objects_by_kind: Dict[str, Set[SimObject]] = defaultdict(set)
+        self.destroyed: Counter = Counter()
+        # Live birds in launch order, a dict so removing one is O(1)
+        self.birds: Dict[SimBird, None] = {}
+        bird_options = bird_options or {}
+        self.bird_options = bird_options
+        self.max_live_birds = max([max_live_birds] + [options.get("split_count", 0) for options in bird_options.values()])
+        # Damage taken by each object during the current step, in hits at the
+        # threshold, and the objects to remove once the step is over. Nothing
+        # is removed from the space while it is stepping.
+        self.damage: Dict[SimObject, float] = defaultdict(float)
+        self.removals: Dict[SimObject, None] = {}
+        # Objects at rest the current step hit, disturbed once it is over
+        self.disturbances: Dict[SimObject, None] = {}
+        self.bird_pools = {
+            kind: BirdPool(bird_class, bird_pool_size, **bird_options.get(kind, {}))
+            for kind, bird_class in BIRD_TYPES.items()
+        }
+        # Physics steps taken since creation, loading or restoring a level does not reset it
+        self.steps = 0
+        self.collision_callbacks = 0
+        # Birds removed by expire_birds, per reason
+        self.culled: Counter = Counter()
+        # Seconds spent in each phase of step(), accumulated until a caller
+        # resets them. None (the default) turns the timing off.
+        self.phase_seconds: Optional[Dict[str, float]] = None
+
+        self.on_spawn: Optional[Callable[[SimObject], None]] = None
+        self.on_remove: Optional[Callable[[SimObject], None]] = None
+        # Called after every step, e.g. to capture frames of a headless run
+        self.on_step: Optional[Callable[["Simulation"], None]] = None
+        # Collisions, destructions, launches and level changes are recorded here when set
+        self.trace: Optional[EventTrace] = None
+
+    def create_space(self, profile: PhysicsProfile, floor_width: Optional[float] = None) -> pymunk.Space:
+        """
+        Empty space tuned by ``profile``, with the floor (``floor_width``
+        long, the current level's by default) and the collision handlers
+        """
+        if floor_width is None:
+            floor_width = self.floor_width
+        space = pymunk.Space()
+        space.gravity = (0, self.gravity)
+        space.iterations = profile.iterations
+        space.sleep_time_threshold = profile.sleep_time_threshold
+        space.idle_speed_threshold = profile.idle_speed_threshold
+        if profile.spatial_hash_dim is not None:
+            space.use_spatial_hash(profile.spatial_hash_dim, profile.spatial_hash_count)
+
+        # Add floor
+        floor_body = pymunk.Body(body_type=pymunk.Body.STATIC)
+        floor_shape = pymunk.Segment(floor_body, [0, FLOOR_Y], [floor_width, FLOOR_Y], 0.0)
+        floor_shape.friction = 0.5  # Menos fricción para que los objetos deslicen más suave
+        floor_shape.elasticity = 0.2  # Menos rebote para evitar daño por impacto
+        floor_shape.collision_type = COLLISION_FLOOR
+        floor_shape.filter = FLOOR_FILTER
+        space.add(floor_body, floor_shape)
+
+        # Collision handlers, one per pair of collision types that can break
+        # something: birds and disturbed objects against anything but birds.
+        # Objects at rest against each other or the floor have none.
+        self.add_damage_handler(space, COLLISION_BIRD, COLLISION_PIG, DAMAGE_THRESHOLD)
+        self.add_damage_handler(space, COLLISION_BIRD, COLLISION_COLUMN, DAMAGE_THRESHOLD)
+        self.add_damage_handler(space, COLLISION_BIRD, COLLISION_PIG_AT_REST, DAMAGE_THRESHOLD)
+        self.add_damage_handler(space, COLLISION_BIRD, COLLISION_COLUMN_AT_REST, DAMAGE_THRESHOLD)
+        self.add_damage_handler(space, COLLISION_PIG, COLLISION_PIG, DAMAGE_THRESHOLD)
+        self.add_damage_handler(space, COLLISION_PIG, COLLISION_COLUMN, DAMAGE_THRESHOLD)
+        self.add_damage_handler(space, COLLISION_PIG, COLLISION_PIG_AT_REST, DAMAGE_THRESHOLD)
+        self.add_damage_handler(space, COLLISION_PIG, COLLISION_COLUMN_AT_REST, DAMAGE_THRESHOLD)
+        self.add_damage_handler(space, COLLISION_COLUMN, COLLISION_COLUMN, DAMAGE_THRESHOLD)
+        self.add_damage_handler(space, COLLISION_COLUMN, COLLISION_PIG_AT_REST, DAMAGE_THRESHOLD)
+        self.add_damage_handler(space, COLLISION_COLUMN, COLLISION_COLUMN_AT_REST, DAMAGE_THRESHOLD)
+        # Colisiones con el suelo usan un umbral más alto
+        self.add_damage_handler(space, COLLISION_PIG, COLLISION_FLOOR, FLOOR_DAMAGE_THRESHOLD)
+        self.add_damage_handler(space, COLLISION_COLUMN, COLLISION_FLOOR, FLOOR_DAMAGE_THRESHOLD)
+        return space
+
+    def add_damage_handler(self, space: pymunk.Space, type_a: int, type_b: int, threshold: float):
+        handler = space.add_collision_handler(type_a, type_b)
+        handler.data["threshold"] = threshold
+        # Only a weak reference back: with the bound method the space and the
+        # simulation form a cycle, and when the garbage collector breaks it
+        # pymunk may free a body before its shapes and crash
+        handler.data["simulation"] = weakref.proxy(self)
+        handler.post_solve = _damage_post_solve
+
+    def add_object(self, obj: SimObject):
+        self.space.add(obj.body, obj.shape)
+        self.register_object(obj)
+
+    def register_object(self, obj: SimObject):
+        """Track an object that is already in the space"""
+        self.objects_by_shape[obj.shape] = obj
+        self.objects_by_kind[obj.kind].add(obj)
+        if self.on_spawn is not None:
+            self.on_spawn(obj)
+
+    def remove_object(self, obj: SimObject):
+        """Remove a game object from the registry and the space"""
+        if self.objects_by_shape.pop(obj.shape, None) is None:
+            return
+        self.space.remove(obj.shape, obj.body)
+        self.objects_by_kind[obj.kind].discard(obj)
+        if self.on_remove is not None:
+            self.on_remove(obj)
+        if isinstance(obj, SimBird):
+            del self.birds[obj]
+            self.bird_pools[obj.kind].release(obj)
+        else:
+            # Pigs and columns only leave the level by being destroyed
+            self.destroyed[obj.kind] += 1
+            if self.trace is not None:
+                self.trace.record(self.steps, EVENT_DESTROY, KIND_CODES[obj.kind], obj.id)
+
+    def queue_removal(self, obj: SimObject):
+        """Remove ``obj`` at the end of the current step, once however many times it is queued"""
+        self.removals[obj] = None
+
+    def flush_removals(self):
+        removals = self.removals
+        if removals:
+            self.removals = {}
+            for obj in removals:
+                self.remove_object(obj)
+
+    def disturb(self, obj: SimObject):
+        """
+        Switch ``obj`` and every object at rest touching it, transitively, to
+        their disturbed collision types. The contacts among them had no
+        handler in the step just taken, so they are checked for damage here:
+        an impact carried through a standing tower breaks what it always did.
+        """
+        if obj.shape.collision_type != obj.rest_collision_type:
+            return
+        component = {obj}
+        pending = [obj]
+        # Impulse of each contact of the component in the last step, by pair of shapes
+        contacts: Dict[frozenset, float] = {}
+        while pending:
+            arbiters = []
+            pending.pop().body.each_arbiter(
+                lambda arbiter: arbiters.append((frozenset(arbiter.shapes), arbiter.total_impulse.length))
+            )
+            for shapes, impulse_norm in arbiters:
+                if shapes in contacts:
+                    continue
+                contacts[shapes] = impulse_norm
+                for shape in shapes:
+                    neighbour = self.objects_by_shape.get(shape)
+                    if (
+                        neighbour is not None
+                        and neighbour not in component
+                        and shape.collision_type == neighbour.rest_collision_type
+                    ):
+                        component.add(neighbour)
+                        pending.append(neighbour)
+
+        for shapes, impulse_norm in contacts.items():
+            types = {shape.collision_type for shape in shapes}
+            if impulse_norm >= MIN_IMPULSE and types <= RESTING_TYPES:
+                threshold = FLOOR_DAMAGE_THRESHOLD if COLLISION_FLOOR in types else DAMAGE_THRESHOLD
+                self.add_contact(*shapes, impulse_norm, threshold)
+        for member in component:
+            member.shape.collision_type = member.collision_type
+
+    def add_bird(self, bird: SimBird):
+        self.birds[bird] = None
+        self.add_object(bird)
+
+    def spawn_birds(self, bird_type: str, x: float, y: float, velocities: List[pymunk.Vec2d]) -> List[SimBird]:
+        """
+        Add one bird of the given kind at ``(x, y)`` for each velocity, with
+        a single call into the space. Used by splitting birds.
+        """
+        pool = self.bird_pools[bird_type]
+        no_impulse = ImpulseVector(0, 0)
+        birds = [pool.acquire(no_impulse, x, y) for _ in velocities]
+        for bird, velocity in zip(birds, velocities):
+            bird.body.velocity = velocity
+        self.space.add(*[item for bird in birds for item in (bird.body, bird.shape)])
+        trace = self.trace
+        for bird in birds:
+            self.birds[bird] = None
+            self.register_object(bird)
+            if trace is not None:
+                trace.record(self.steps, EVENT_LAUNCH, KIND_CODES[bird_type], bird.id, x=x, y=y)
+        return birds
+
+    def launch(self, bird_type: str, impulse_vector: ImpulseVector, x: float, y: float) -> SimBird:
+        """Throw a bird of the given kind ("red", "blue" or "yellow"), reusing a pooled one if possible"""
+        bird = self.bird_pools[bird_type].acquire(impulse_vector, x, y)
+        self.add_bird(bird)
+        if self.trace is not None:
+            self.trace.record(
+                self.steps,
+                EVENT_LAUNCH,
+                KIND_CODES[bird_type],
+                bird.id,
+                x=x,
+                y=y,
+                value=impulse_vector.impulse,
+                angle=impulse_vector.angle,
+            )
+        return bird
+
+    def power_up(self, bird: SimBird):
+        # Ignore birds that already expired, they may be back in the pool
+        if bird.shape in self.objects_by_shape:
+            if self.trace is not None:
+                self.trace.record(self.steps, EVENT_POWER_UP, KIND_CODES[bird.kind], bird.id)
+            bird.power_up(self)
+
+    def bird_pool_stats(self) -> Dict[str, Dict[str, int]]:
+        return {kind: pool.stats() for kind, pool in self.bird_pools.items()}
+
+    def load_level(self, level_data: LevelData, profile: Optional[PhysicsProfile] = None):
+        """
+        Build a level in a fresh space. The physics profile is ``profile`` if
+        given, else the one stored in the level, else derived from it.
+        """
+        self.swap_level(self.prepare_level(level_data, profile))
+
+    def prepare_level(self, level_data: LevelData, profile: Optional[PhysicsProfile] = None) -> LevelBuild:
+        """
+        Start building a level without touching the running one. Call
+        ``build`` on the result to add its objects, all at once or spread
+        over several frames, then ``swap_level`` to switch to it.
+        """
+        return LevelBuild(self, level_data, profile)
+
+    def swap_level(self, build: LevelBuild):
+        """
+        Replace the running level with a prepared one, finishing its build
+        first if needed. Like ``load_level``, this calls ``on_spawn`` for
+        every object but not ``on_remove``.
+        """
+        if not build.done:
+            build.build()
+        # The old space is dropped whole, only its birds go back to the pools
+        self.forget_level()
+        self.profile = build.profile
+        self.floor_width = build.floor_width
+        self.space = build.space
+        if self.trace is not None:
+            self.trace.record(self.steps, EVENT_LEVEL, a=len(build.level_data.columns), b=len(build.level_data.pigs))
+        for obj in build.objects:
+            self.register_object(obj)
+
+    def clear_level(self):
+        """
+        Drop every object by replacing the space with an empty one.
+        ``on_remove`` is not called.
+        """
+        self.forget_level()
+        self.space = self.create_space(self.profile)
+
+    def forget_level(self):
+        """
+        Empty the object registries and the per-step queues, leaving the
+        space as it is. Birds are detached from it first so the pool can add
+        them to another space.
+        """
+        for bird in self.birds:
+            self.space.remove(bird.shape, bird.body)
+            self.bird_pools[bird.kind].release(bird)
+        self.birds.clear()
+        self.objects_by_shape.clear()
+        self.objects_by_kind.clear()
+        self.destroyed.clear()
+        self.damage.clear()
+        self.removals.clear()
+        self.disturbances.clear()
+
+    def snapshot(self) -> Snapshot:
+        """Record the level as it is now, to ``restore`` it later"""
+        objects = [(obj, obj.state()) for obj in self.objects_by_shape.values() if not isinstance(obj, SimBird)]
+        return Snapshot(objects, self.profile, self.floor_width, Counter(self.destroyed))
+
+    def restore(self, snapshot: Snapshot):
+        """
+        Put the level back as it was when ``snapshot`` was taken. The recorded
+        objects are reset and moved into a fresh space instead of being built
+        again, so their sprites stay bound to them; birds in flight are
+        dropped. Like ``load_level``, this calls ``on_spawn`` for every
+        object but not ``on_remove``. Stepping after a restore gives the same
+        result every time.
+        """
+        if self.trace is not None:
+            self.trace.record(self.steps, EVENT_RESTORE)
+        # Bodies can only join the new space once they have left the old one
+        self.space.remove(*[item for obj in self.objects_by_shape.values() for item in (obj.shape, obj.body)])
+        for bird in self.birds:
+            self.bird_pools[bird.kind].release(bird)
+        self.birds.clear()
+        self.objects_by_shape.clear()
+        self.objects_by_kind.clear()
+        self.damage.clear()
+        self.removals.clear()
+        self.disturbances.clear()
+
+        self.profile = snapshot.profile
+        self.floor_width = snapshot.floor_width
+        self.space = self.create_space(self.profile)
+        for obj, (position, velocity, angle, angular_velocity, health, collision_type) in snapshot.objects:
+            body = obj.body
+            # A zero length position update clears the solver's bias velocity,
+            # which pymunk does not expose and would otherwise leak into the next step
+            pymunk.Body.update_position(body, 0)
+            body.position = position
+            body.velocity = velocity
+            body.angle = angle
+            body.angular_velocity = angular_velocity
+            # Objects disturbed when recorded keep their damage handlers
+            obj.shape.collision_type = collision_type
+            obj.health = health
+            obj.store_previous_state()
+            self.add_object(obj)
+        self.destroyed = Counter(snapshot.destroyed)
+
+    def collision_handler(self, arbiter, space, data):
+        """Post solve callback of every damaging pair, see add_contact"""
+        self.collision_callbacks += 1
+        impulse_norm = arbiter.total_impulse.length
+        if impulse_norm < MIN_IMPULSE:  # Umbral mínimo para detectar colisiones
+            return True
+        self.add_contact(*arbiter.shapes, impulse_norm, data["threshold"])
+        return True
+
+    def add_contact(self, shape_a: pymunk.Shape, shape_b: pymunk.Shape, impulse_norm: float, threshold: float):
+        """
+        Trace a contact, add its impulse in hits at ``threshold`` to the
+        damage of the objects involved if it is over the threshold, and
+        disturb those at rest. Both are applied after the step, in
+        update_collisions.
+        """
+        obj_a = self.objects_by_shape.get(shape_a)
+        obj_b = self.objects_by_shape.get(shape_b)
+        if self.trace is not None:
+            self.trace.collision(
+                self.steps, obj_a.id if obj_a is not None else 0, obj_b.id if obj_b is not None else 0, impulse_norm
+            )
+
+        # Daño en colisiones fuertes, se aplica al final del paso
+        hits = impulse_norm / threshold
+        for shape, obj in ((shape_a, obj_a), (shape_b, obj_b)):
+            # Los pájaros no se destruyen por impacto
+            if obj is None or shape.collision_type == COLLISION_BIRD:
+                continue
+            if shape.collision_type == obj.rest_collision_type:
+                self.disturbances[obj] = None
+            if hits > 1:
+                self.damage[obj] += hits
+
+    def update_collisions(self):
+        """
+        Post-step pass: disturb the objects at rest the step hit, apply the
+        damage gathered during the step, queue the objects left without
+        health and remove everything queued
+        """
+        while self.disturbances:
+            # Disturbing an object can add contacts, and so disturbances, of its own
+            disturbances, self.disturbances = self.disturbances, {}
+            for obj in disturbances:
+                self.disturb(obj)
+        damage = self.damage
+        if damage:
+            for obj, hits in damage.items():
+                obj.health -= hits
+                if obj.health <= 0:
+                    self.queue_removal(obj)
+            damage.clear()
+        self.flush_removals()
+
+    def expire_birds(self):
+        """
+        Queue the removal of the birds that are past their lifetime, out of
+        the world or at rest, and of the oldest ones over ``max_live_birds``.
+        Birds above the window are kept, gravity brings them back.
+        """
+        left = -BIRD_CULL_MARGIN
+        right = self.floor_width + BIRD_CULL_MARGIN
+        bottom = FLOOR_Y - BIRD_CULL_MARGIN
+        culled = self.culled
+        alive = []
+        for bird in self.birds:
+            if bird.timer > BIRD_LIFETIME:
+                reason = "expired"
+            elif bird.rest_time > BIRD_REST_TIME:
+                reason = "at_rest"
+            else:
+                x, y = bird.body.position
+                if x < left or x > right or y < bottom:
+                    reason = "off_world"
+                else:
+                    alive.append(bird)
+                    continue
+            culled[reason] += 1
+            self.queue_removal(bird)
+        # self.birds is in launch order, the oldest go first
+        for bird in alive[: max(0, len(alive) - self.max_live_birds)]:
+            culled["over_cap"] += 1
+            self.queue_removal(bird)
+
+    def update_birds(self):
+        for bird in list(self.birds):
+            bird.update(self, self.dt)
+
+    def step(self, n: int = 1):
+        """Advance the simulation ``n`` fixed physics steps"""
+        if self.phase_seconds is not None:
+            self.step_timed(n)
+            return
+        substep_dt = self.dt / self.substeps
+        for _ in range(n):
+            for _ in range(self.substeps):
+                self.space.step(substep_dt)
+            self.expire_birds()
+            self.update_collisions()
+            self.update_birds()
+            self.steps += 1
+            if self.on_step is not None:
+                self.on_step(self)
+
+    def step_timed(self, n: int):
+        """``step``, adding the time of each phase to ``phase_seconds``"""
+        substep_dt = self.dt / self.substeps
+        clock = time.perf_counter
+        times = self.phase_seconds
+        for _ in range(n):
+            t0 = clock()
+            for _ in range(self.substeps):
+                self.space.step(substep_dt)
+            t1 = clock()
+            self.expire_birds()
+            t2 = clock()
+            self.update_collisions()
+            t3 = clock()
+            self.update_birds()
+            t4 = clock()
+            times["space.step"] += t1 - t0
+            times["bird_expiry"] += t2 - t1
+            times["update_collisions"] += t3 - t2
+            times["bird_update"] += t4 - t3
+            self.steps += 1
+            if self.on_step is not None:
+                self.on_step(self)
+
+    def store_previous_state(self):
+        for obj in self.objects_by_shape.values():
+            obj.store_previous_state()
+
+    def is_settled(self, speed_threshold: float = 5.0) -> bool:
+        """True when every dynamic body moves slower than ``speed_threshold``"""
+        for body in self.space.bodies:
+            if (
+                body.body_type == pymunk.Body.DYNAMIC
+                and not body.is_sleeping
+                and body.velocity.length > speed_threshold
+            ):
+                return False
+        return True
+
+    def run_until_settled(
+        self,
+        max_steps: int = 60 * 20,
+        speed_threshold: float = 5.0,
+        check_every: int = 10,
+    ) -> int:
+        """
+        Step until no bird is alive and everything is at rest, or until
+        ``max_steps`` have passed. Returns the number of steps taken.
+        """
+        taken = 0
+        while taken < max_steps:
+            n = min(check_every, max_steps - taken)
+            self.step(n)
+            taken += n
+            if not self.birds and self.is_settled(speed_threshold):
+                break
+        return taken
+
+    def count(self, kind: str) -> int:
+        """Live objects of a kind: "pig", "column" or a bird type"""
+        return len(self.objects_by_kind[kind])
+
+    def pigs_remaining(self) -> int:
+        return len(self.objects_by_kind[SimPig.kind])
+
+    def is_level_complete(self) -> bool:
+        return not self.objects_by_kind[SimPig.kind]
+
+    @property
+    def score(self) -> int:
+        return self.destroyed[SimPig.kind] * PIG_SCORE + self.destroyed[SimColumn.kind] * COLUMN_SCORE
@@ -0,0 +1,263 @@
+"""
+Shot solver. Searches the slingshot pull space of every level for the shots
+that destroy the most pigs, running candidate shots in parallel on the
+headless simulation. Results are cached on disk, keyed by the level data and
+the physics constants, so an unchanged level is never solved twice.
+
+    python solver.py --level 2 --workers 8
+"""
+import argparse
+import dataclasses
+import hashlib
+import json
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import simulation
+from game_logic import Point2D, get_impulse_vector
+from levels import LevelData, levels
+from simulation import (
+    BIRD_TYPES,
+    MAX_PULL_DISTANCE,
+    SLINGSHOT_X,
+    SLINGSHOT_Y,
+    Simulation,
+    Snapshot,
+)
+
+CACHE_DIR = ".solver_cache"
+CACHE_VERSION = 4
+
+# Steps after launch at which the bird power up is triggered (None: never)
+POWER_UP_STEPS = {
+    "red": (None,),
+    "blue": (None, 20, 40),
+    "yellow": (None, 10, 30),
+}
+
+
+@dataclass
+class Shot:
+    pull_x: float
+    pull_y: float
+    power_up_step: Optional[int]
+    pigs_destroyed: int = 0
+    objects_destroyed: int = 0
+
+    @property
+    def score(self) -> Tuple[int, int]:
+        return self.pigs_destroyed, self.objects_destroyed
+
+
+def physics_constants() -> Dict[str, float]:
+    """Every constant of the simulation module that can change a shot's outcome"""
+    return {
+        name: value
+        for name, value in vars(simulation).items()
+        if name.isupper() and isinstance(value, (int, float))
+    }
+
+
+def cache_key(level_data: LevelData, bird_type: str, **params) -> str:
+    payload = json.dumps(
+        {
+            "version": CACHE_VERSION,
+            "level": dataclasses.asdict(level_data),
+            "bird_type": bird_type,
+            "physics": physics_constants(),
+            "params": params,
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+# Settled level of the last shot simulated in this process, as (key,
+# simulation, snapshot). Shots on the same level restore it instead of
+# loading and settling the level again.
+_settled: Optional[Tuple[str, Simulation, Snapshot]] = None
+
+
+def settled_simulation(level_data: LevelData, settle_steps: int) -> Simulation:
+    """Simulation of the level after ``settle_steps`` steps at rest, ready for a shot"""
+    global _settled
+    key = cache_key(level_data, "", settle_steps=settle_steps)
+    if _settled is None or _settled[0] != key:
+        sim = Simulation()
+        sim.load_level(level_data)
+        sim.step(settle_steps)
+        _settled = (key, sim, sim.snapshot())
+    _, sim, snapshot = _settled
+    # Restored even the first time, so every shot starts from the same state
+    sim.restore(snapshot)
+    return sim
+
+
+def simulate_shot(
+    level_data: LevelData,
+    bird_type: str,
+    pull_x: float,
+    pull_y: float,
+    power_up_step: Optional[int],
+    settle_steps: int,
+) -> Shot:
+    """Fire one shot on the settled level and count the damage"""
+    sim = settled_simulation(level_data, settle_steps)
+    pigs_destroyed, objects_destroyed = fire_shot(sim, bird_type, pull_x, pull_y, power_up_step)
+    return Shot(pull_x, pull_y, power_up_step, pigs_destroyed, objects_destroyed)
+
+
+def fire_shot(
+    sim: Simulation,
+    bird_type: str,
+    pull_x: float,
+    pull_y: float,
+    power_up_step: Optional[int],
+    max_steps: int = 60 * 20,
+) -> Tuple[int, int]:
+    """
+    Launch a bird from a pull point and step until everything is at rest.
+    Returns the pigs and the objects (pigs included) destroyed by the shot.
+    """
+    pigs_before = sim.destroyed["pig"]
+    objects_before = sum(sim.destroyed.values())
+
+    impulse_vector = get_impulse_vector(Point2D(SLINGSHOT_X, SLINGSHOT_Y), Point2D(pull_x, pull_y))
+    bird = sim.launch(bird_type, impulse_vector, pull_x, pull_y)
+    if power_up_step is not None:
+        sim.step(power_up_step)
+        if bird in sim.birds:
+            sim.power_up(bird)
+    sim.run_until_settled(max_steps)
+    return sim.destroyed["pig"] - pigs_before, sum(sim.destroyed.values()) - objects_before
+
+
+def _simulate_shot(args) -> Shot:
+    return simulate_shot(*args)
+
+
+def clamp_pull(x: float, y: float) -> Tuple[float, float]:
+    """Clamp a pull point to the disc the slingshot allows, like App.on_mouse_drag"""
+    dx = x - SLINGSHOT_X
+    dy = y - SLINGSHOT_Y
+    distance = math.hypot(dx, dy)
+    if distance > MAX_PULL_DISTANCE:
+        factor = MAX_PULL_DISTANCE / distance
+        return SLINGSHOT_X + dx * factor, SLINGSHOT_Y + dy * factor
+    return x, y
+
+
+def coarse_grid(n_angles: int, n_radii: int) -> List[Tuple[float, float]]:
+    """Polar grid of pull points covering the whole pull disc"""
+    points = []
+    for i in range(n_angles):
+        angle = 2 * math.pi * i / n_angles
+        for j in range(1, n_radii + 1):
+            radius = MAX_PULL_DISTANCE * j / n_radii
+            points.append((SLINGSHOT_X + radius * math.cos(angle), SLINGSHOT_Y + radius * math.sin(angle)))
+    return points
+
+
+def refine_grid(shot: Shot, spacing: float) -> List[Tuple[float, float]]:
+    """3x3 neighbourhood of pull points around a shot"""
+    points = []
+    for i in (-1, 0, 1):
+        for j in (-1, 0, 1):
+            if i or j:
+                points.append(clamp_pull(shot.pull_x + i * spacing, shot.pull_y + j * spacing))
+    return points
+
+
+def solve(
+    level_data: LevelData,
+    bird_type: str,
+    executor: ProcessPoolExecutor,
+    n_angles: int = 16,
+    n_radii: int = 4,
+    rounds: int = 3,
+    top_k: int = 4,
+    settle_steps: int = 60,
+    use_cache: bool = True,
+) -> List[Shot]:
+    """
+    Rank shots for one level and bird type, best first. A coarse polar grid
+    over the pull disc is simulated first, then the neighbourhood of the
+    ``top_k`` best shots is refined ``rounds`` times at half the spacing.
+    """
+    params = dict(n_angles=n_angles, n_radii=n_radii, rounds=rounds, top_k=top_k, settle_steps=settle_steps)
+    key = cache_key(level_data, bird_type, **params)
+    cache_path = os.path.join(CACHE_DIR, f"{key}.json")
+    if use_cache and os.path.exists(cache_path):
+        with open(cache_path) as f:
+            return [Shot(**shot) for shot in json.load(f)]
+
+    power_up_steps = POWER_UP_STEPS[bird_type]
+    seen = set()
+    shots: List[Shot] = []
+
+    def run(points: Sequence[Tuple[float, float]]):
+        jobs = []
+        for x, y in points:
+            for power_up_step in power_up_steps:
+                candidate = (round(x, 3), round(y, 3), power_up_step)
+                if candidate not in seen:
+                    seen.add(candidate)
+                    jobs.append((level_data, bird_type, *candidate, settle_steps))
+        shots.extend(executor.map(_simulate_shot, jobs, chunksize=max(1, len(jobs) // 64)))
+        shots.sort(key=lambda shot: shot.score, reverse=True)
+
+    run(coarse_grid(n_angles, n_radii))
+    spacing = MAX_PULL_DISTANCE / n_radii
+    for _ in range(rounds):
+        spacing /= 2
+        points = []
+        for shot in shots[:top_k]:
+            points.extend(refine_grid(shot, spacing))
+        run(points)
+
+    if use_cache:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(cache_path, "w") as f:
+            json.dump([dataclasses.asdict(shot) for shot in shots], f)
+    return shots
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Find the best shots for each level")
+    parser.add_argument("--level", type=int, action="append", help="level number from 1, repeatable (default: all)")
+    parser.add_argument("--bird", choices=sorted(BIRD_TYPES), action="append", help="bird type, repeatable (default: all)")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--no-cache", action="store_true")
+    args = parser.parse_args()
+
+    for level in args.level or ():
+        if not 1 <= level <= len(levels):
+            parser.error(f"--level {level}: there are levels 1 to {len(levels)}")
+    level_indices = [level - 1 for level in args.level] if args.level else range(len(levels))
+    bird_types = args.bird or list(BIRD_TYPES)
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        for level_index in level_indices:
+            for bird_type in bird_types:
+                shots = solve(
+                    levels[level_index],
+                    bird_type,
+                    executor,
+                    rounds=args.rounds,
+                    use_cache=not args.no_cache,
+                )
+                best = shots[0]
+                print(
+                    f"level {level_index + 1} {bird_type:>6}: "
+                    f"pull ({best.pull_x:.1f}, {best.pull_y:.1f}) "
+                    f"power up {best.power_up_step} -> "
+                    f"{best.pigs_destroyed} pigs, {best.objects_destroyed} objects "
+                    f"({len(shots)} shots simulated)"
+                )
+
+
+if __name__ == "__main__":
+    main()
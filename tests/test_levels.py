@@ -0,0 +1,47 @@
+import pytest
+
+from level_generator import generate_level
+from levels import LevelData, LevelSet, PhysicsProfile, levels, read_level, write_level
+from simulation import derive_physics_profile
+
+CASES = [pytest.param(level_data, id=f"level {i + 1}") for i, level_data in enumerate(levels)]
+CASES.append(pytest.param(generate_level("fortress", 200, 20, seed=3), id="generated"))
+
+
+def with_physics(level_data: LevelData) -> LevelData:
+    return LevelData(level_data.columns, level_data.pigs, derive_physics_profile(level_data))
+
+
+@pytest.mark.parametrize("extension", [".json", ".npz"])
+@pytest.mark.parametrize("level_data", CASES)
+def test_round_trip(tmp_path, level_data, extension):
+    path = str(tmp_path / f"level{extension}")
+    write_level(level_data, path)
+    assert read_level(path) == level_data
+
+
+@pytest.mark.parametrize("extension", [".json", ".npz"])
+def test_round_trip_with_physics(tmp_path, extension):
+    level_data = with_physics(levels[2])
+    assert isinstance(level_data.physics, PhysicsProfile)
+    path = str(tmp_path / f"level{extension}")
+    write_level(level_data, path)
+    assert read_level(path) == level_data
+
+
+def test_unknown_extension(tmp_path):
+    with pytest.raises(ValueError):
+        write_level(levels[0], str(tmp_path / "level.txt"))
+    with pytest.raises(ValueError):
+        read_level(str(tmp_path / "level.txt"))
+
+
+def test_level_set_reads_files_in_order(tmp_path):
+    paths = []
+    for i, level_data in enumerate(levels):
+        path = str(tmp_path / f"{i:02d}{'.json' if i % 2 else '.npz'}")
+        write_level(level_data, path)
+        paths.append(path)
+    level_set = LevelSet(str(tmp_path))
+    assert len(level_set) == len(levels)
+    assert list(level_set) == list(levels)
@@ -0,0 +1,120 @@
+import math
+
+import pytest
+
+from game_logic import ImpulseVector, Point2D, get_impulse_vector
+from levels import levels
+from simulation import MAX_LIVE_BIRDS, SLINGSHOT_X, SLINGSHOT_Y, SimBlueBird, Simulation
+
+
+def settled(level_index: int, steps: int = 60) -> Simulation:
+    sim = Simulation()
+    sim.load_level(levels[level_index])
+    sim.step(steps)
+    return sim
+
+
+def world_state(sim: Simulation):
+    """Every live object with its exact body state, in a stable order"""
+    return sorted(
+        (obj.id, obj.kind, tuple(obj.body.position), tuple(obj.body.velocity), obj.body.angle, obj.health)
+        for obj in sim.objects_by_shape.values()
+    )
+
+
+def shoot(sim: Simulation, bird_type: str, power_up_step=None, steps: int = 300):
+    pull_x, pull_y = 200, 40
+    impulse_vector = get_impulse_vector(Point2D(SLINGSHOT_X, SLINGSHOT_Y), Point2D(pull_x, pull_y))
+    bird = sim.launch(bird_type, impulse_vector, pull_x, pull_y)
+    for i in range(steps):
+        if i == power_up_step:
+            sim.power_up(bird)
+        sim.step()
+    return world_state(sim), dict(sim.destroyed), sim.score
+
+
+def test_restore_puts_the_level_back():
+    sim = settled(1)
+    before = world_state(sim)
+    snapshot = sim.snapshot()
+    shoot(sim, "red")
+    sim.restore(snapshot)
+    assert world_state(sim) == before
+    assert not sim.birds
+    assert sim.destroyed == snapshot.destroyed
+
+
+@pytest.mark.parametrize("bird_type, power_up_step", [("red", None), ("blue", 20), ("yellow", 10)])
+@pytest.mark.parametrize("level_index", range(len(levels)))
+def test_stepping_after_restore_is_deterministic(level_index, bird_type, power_up_step):
+    sim = settled(level_index)
+    snapshot = sim.snapshot()
+    sim.restore(snapshot)
+    first = shoot(sim, bird_type, power_up_step)
+    sim.restore(snapshot)
+    second = shoot(sim, bird_type, power_up_step)
+    assert first == second
+
+
+def test_restore_mid_collapse():
+    # Taken while the level falls apart, with some objects disturbed and others still at rest
+    sim = settled(3)
+    shoot(sim, "red", steps=90)
+    snapshot = sim.snapshot()
+    assert any(state[-1] != obj.rest_collision_type for obj, state in snapshot.objects)
+
+    sim.restore(snapshot)
+    assert [obj.state() for obj, _ in snapshot.objects] == [state for _, state in snapshot.objects]
+    sim.step(300)
+    first = world_state(sim), dict(sim.destroyed)
+    sim.restore(snapshot)
+    sim.step(300)
+    assert (world_state(sim), dict(sim.destroyed)) == first
+
+
+def test_independently_settled_simulations_agree():
+    # Two simulations that load and settle the same level give the same shot result
+    sim = settled(3)
+    snapshot = sim.snapshot()
+    sim.restore(snapshot)
+    expected = shoot(sim, "red")
+
+    other = settled(3)
+    other.restore(other.snapshot())
+    assert shoot(other, "red")[1:] == expected[1:]
+
+
+@pytest.mark.parametrize("count, spread", [(2, 60), (3, 60), (4, 30), (20, 90), (50, 120)])
+def test_split_angles_are_an_even_centred_fan(count, spread):
+    bird = SimBlueBird(ImpulseVector(0, 0), 0, 0, split_count=count, split_spread=spread)
+    angles = bird.split_angles()
+    assert len(angles) == count
+    gaps = [b - a for a, b in zip(angles, angles[1:])]
+    assert gaps == pytest.approx([math.radians(spread) / (count - 1)] * (count - 1))
+    assert sum(angles) == pytest.approx(0, abs=1e-9)
+
+
+def test_split_of_one_keeps_the_direction():
+    bird = SimBlueBird(ImpulseVector(0, 0), 0, 0, split_count=1)
+    assert bird.split_angles() == [0.0]
+
+
+@pytest.mark.parametrize("count", [3, 30])
+def test_power_up_fans_out_every_bird(count):
+    sim = Simulation(bird_options={"blue": {"split_count": count, "split_spread": 90}})
+    sim.load_level(levels[0])
+    bird = sim.launch("blue", ImpulseVector(0.5, 80), SLINGSHOT_X, SLINGSHOT_Y)
+    sim.step(5)
+    velocity = bird.body.velocity
+    sim.power_up(bird)
+    # The largest split fits under the cap and survives the next step whole
+    assert sim.max_live_birds >= max(count, MAX_LIVE_BIRDS)
+    assert len(sim.birds) == count
+
+    directions = sorted(b.body.velocity.angle - velocity.angle for b in sim.birds)
+    assert directions == pytest.approx(sorted(bird.split_angles()))
+    assert [b.body.velocity.length for b in sim.birds] == pytest.approx([velocity.length] * count)
+    sim.step()
+    assert len(sim.birds) == count
+    assert bird in sim.birds
+    assert not sim.culled
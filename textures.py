@@ -0,0 +1,57 @@
+"""
+Texture registry. Every image in assets/img is decoded once, in a background
+thread started before the window opens, and sprites are built from the
+resolved textures so spawning objects never touches the image loader.
+"""
+import os
+import threading
+from typing import Dict, Optional
+
+import arcade
+
+TEXTURE_DIR = "assets/img"
+
+_textures: Dict[str, arcade.Texture] = {}
+_loader: Optional[threading.Thread] = None
+
+
+def _load_all():
+    for name in sorted(os.listdir(TEXTURE_DIR)):
+        if name.endswith(".png"):
+            path = f"{TEXTURE_DIR}/{name}"
+            # Decoding only needs PIL, the GPU upload happens later in upload()
+            _textures[path] = arcade.load_texture(path)
+
+
+def start_preload():
+    """Start decoding every texture in TEXTURE_DIR in a background thread"""
+    global _loader
+    if _loader is None:
+        _loader = threading.Thread(target=_load_all, name="texture-preload", daemon=True)
+        _loader.start()
+
+
+def wait_for_preload():
+    if _loader is not None:
+        _loader.join()
+
+
+def get_texture(path: str) -> arcade.Texture:
+    """
+    Texture for an image path such as "assets/img/column.png". Waits for the
+    preload if it is still running and falls back to loading the image.
+    """
+    texture = _textures.get(path)
+    if texture is None:
+        wait_for_preload()
+        texture = _textures.get(path)
+        if texture is None:
+            texture = _textures[path] = arcade.load_texture(path)
+    return texture
+
+
+def upload(atlas):
+    """Add every preloaded texture to a texture atlas, so the first draw of a sprite does not have to"""
+    wait_for_preload()
+    for texture in _textures.values():
+        atlas.add(texture)